@@ -1,7 +1,15 @@
 import pygame
-from random import choice, random, randrange
-from pathfinding.finder.a_star import AStarFinder
-from pathfinding.core.grid import Grid as PathGrid
+from collections import OrderedDict
+from random import Random, randrange
+from threading import Event, Thread
+from time import perf_counter
+from maze_model import MazeModel, TYPE_MASK, WALL, CELL, PASSAGE, VISITED
+from navigation import DistanceField
+from tree_distance import TreeDistance
+from maze_generators import generate, play_rng, finish, run_for
+from endless_maze import EndlessMaze
+from maze_pool import MazePool
+from maze_analysis import analyse
 from sys import exit
 
 pygame.init()
@@ -20,321 +28,361 @@ DARK_GREY = (30, 30, 30)
 BLUE = (0, 0, 128)
 BRIGHT_GREEN = (0, 255, 0)
 
+# Colours of a maze on the loading screen while it's carved: walls, cells
+# and passages that have been carved, and cells not reached yet. The lookup
+# turns every tile byte into its colour's place in the palette.
+CARVING_PALETTE = [DARK_GREY, WHITE, GREY]
+CARVING_COLOURS = bytes(0 if tile & TYPE_MASK == WALL else 1 if tile & VISITED or tile & TYPE_MASK == PASSAGE else 2
+                        for tile in range(256))
+
 # Fonts that will be used to render text.
 SMALL_FONT = pygame.font.SysFont(None, 35)
 BIG_FONT = pygame.font.SysFont(None, 70)
 
-# Custom event.
-TIMER_EVENT = pygame.USEREVENT + 1
+# The world is stepped this many times for every second of game time. The
+# window also runs at this many frames per second.
+TICKS_PER_SECOND = 60
+
+# Difficulty presets, by name: (cells per side, loop chance, item chance,
+# time in seconds, minimap tile pixels, maze generator from maze_generators).
+PRESETS = {"EASY": (15, 0.1, 0.5, 60, 8, "backtracker"),
+           "MEDIUM": (27, 0.08, 0.25, 120, 5, "backtracker"),
+           "HARD": (45, 0.05, 0.20, 180, 3, "backtracker")}
+
+# How hard the maze of each preset should be, from where the player starts:
+# (fewest and most steps to the exit, fewest and most dead ends per cell),
+# with steps in widths of the maze. The enemy starts by the exit, so the
+# fewest steps to the exit keep it away from the player too. Mazes are picked
+# from a pool made ahead of time to fit them. Around half of all mazes fit
+# each target.
+PRESET_TARGETS = {"EASY": (1.0, 2.0, 0.05, 0.11),
+                  "MEDIUM": (1.2, 2.2, 0.06, 0.10),
+                  "HARD": (1.4, 2.7, 0.07, 0.10)}
+
+# Mazes kept ready for each preset.
+POOL_SIZE = 2
+
+# A maze that isn't ready in the pool is made while the loading screen is
+# shown: on a thread of its own, or, if LOAD_IN_FRAMES is True, a few steps
+# at a time in the game loop, with LOAD_FRAME_SECONDS of every frame given to
+# it. SHOW_CARVING draws the maze on the loading screen as it's carved.
+LOAD_IN_FRAMES = False
+LOAD_FRAME_SECONDS = 0.004
+SHOW_CARVING = True
+
+# The enemy chases with a TreeDistance in mazes with at most this many loops,
+# and with a DistanceField in any others. A TreeDistance answers for wherever
+# the player is without searching, in a time that grows with the loops, but
+# keeps the distance from every loop to every tile, at 4 bytes each and about
+# half a microsecond each to work out, so the loops times the tiles can't be
+# more than TREE_DISTANCE_MAX_ENTRIES either. That is about 6 MB, and every
+# HARD maze fits. It is built while loading.
+TREE_DISTANCE_MAX_LOOPS = 150
+TREE_DISTANCE_MAX_ENTRIES = 1500000
+
+# The endless mode: (cells across, loop chance, item chance, time in seconds,
+# minimap tile pixels). It has no exit, so the game goes on until the player
+# is caught or the time runs out.
+ENDLESS_PRESET = (15, 0.1, 0.3, 120, 5)
 
-# Sprite groups.
-TILES_GROUP = pygame.sprite.Group()
-WALLS_GROUP = pygame.sprite.Group()
-CELLS_GROUP = pygame.sprite.Group()
-PASSAGES_GROUP = pygame.sprite.Group()
-ENEMY_GROUP = pygame.sprite.Group()
-ITEMS_GROUP = pygame.sprite.Group()
-PLAYER_GROUP = pygame.sprite.Group()
+# Rows of cells kept in memory in the endless mode. Once the player is past
+# the middle of them, ENDLESS_ADVANCE_CELL_ROWS rows are dropped from the top
+# and made at the bottom. Twice that is a whole number of chunks, so the
+# chunks already baked can be kept.
+ENDLESS_WINDOW_CELL_ROWS = 24
+ENDLESS_ADVANCE_CELL_ROWS = 8
+
+# The fewest steps from the player that the enemy is put back at, when the
+# rows it was on are dropped.
+ENEMY_RESPAWN_DISTANCE = 12
 
 # The size, in pixels, of a side of each individual square tile. Many other
 # variables will depend on it.
 TILE_PIXELS = 40
 
-# Creating the window.
-display_surface = pygame.display.set_mode((MAX_WIDTH, MAX_HEIGHT))
-pygame.display.set_caption("Game")
+# The furthest the player moves before checking for walls again. It is less
+# than a wall is thick, so walls can't be skipped even at high speeds.
+MAX_MOVE_STEP = TILE_PIXELS//2
+
+# The maze is drawn in square chunks of this many tiles, and only this many
+# chunk surfaces are kept in memory at once.
+CHUNK_TILES = 16
+MAX_CHUNKS = 32
+
+# Render layers used by the camera, drawn in this order on top of the maze
+# and its items.
+ACTORS_LAYER = 0
 
-# The two item textures are pre-loaded.
-BREAK_TEXTURE = pygame.image.load("textures/W_Mace003.png").convert_alpha()
-JUMP_TEXTURE = pygame.image.load("textures/I_FrogLeg.png").convert_alpha()
+# The two item textures are pre-loaded, by item type. They are converted to
+# the display's pixel format once the window is opened.
+TEXTURES = {"BREAK": pygame.image.load("textures/W_Mace003.png"),
+            "JUMP": pygame.image.load("textures/I_FrogLeg.png")}
+
+## FUNCTIONS
+# Returns a new surface, converted to the display's pixel format if there is a
+# display. Without one the world can still run, it just can't be drawn.
+def new_surface(size):
+    surface = pygame.Surface(size)
+    if pygame.display.get_surface() != None:
+        surface = surface.convert()
+    return surface
 
 ## CLASSES
-# Sprite that acts as a row/column coordinate on the grid.
-# Only needed for the other tiles to inherit from, will never be placed on the 
-# grid.
-class Tile(pygame.sprite.Sprite):
+# A row/column coordinate on the grid, with the rect it takes up in maze
+# pixels. Only needed for the other tiles to inherit from.
+# Tiles aren't kept anywhere: the maze is only the bytes of its MazeModel,
+# and Grid.get_tile() makes a tile from them whenever one is asked for, so
+# a tile is a snapshot of the model at that moment. Tiles don't have their
+# own surface either, as the maze is drawn in chunks by the ChunkRenderer.
+class Tile():
     def __init__(self, row, col):
-        super().__init__()
         self.row = row
         self.col = col
-        self.image = pygame.Surface((TILE_PIXELS, TILE_PIXELS)).convert()
-        self.rect = self.image.get_rect()
-        self.colour = None
+        self.rect = pygame.Rect(col*TILE_PIXELS, row*TILE_PIXELS, TILE_PIXELS, TILE_PIXELS)
         self.type = None
-        TILES_GROUP.add(self)
-        CAMERA_GROUP.add(self)
 
     def get_pos(self):
         return self.row, self.col
 
-    def change_colour(self, colour):
-        self.colour = colour
-        self.image.fill(self.colour)
-
 class Wall(Tile):
-    def __init__(self, row, col, is_special):
+    def __init__(self, row, col, is_special, is_exit):
         super().__init__(row, col)
         self.type = "WALL"
         self.special = is_special
-        self.is_exit = False
-        if self.special:
-            self.colour = LIGHT_GREY
-        else:
-            self.colour = WHITE
-        self.image.fill(self.colour)
-        WALLS_GROUP.add(self)
-    
-    # Changes the wall to an exit.
-    def make_exit(self):
-        self.is_exit = True
-        self.change_colour(BLACK)
+        self.is_exit = is_exit
 
 class Cell(Tile):
     def __init__(self, row, col):
         super().__init__(row, col)
         self.type = "CELL"
-        self.visited = False
-        self.change_colour(BLACK)
-        CELLS_GROUP.add(self)
-
-    def is_visited(self):
-        return self.visited
-
-    def visit(self):
-        self.visited = True
 
 class Passage(Tile):
     def __init__(self, row, col):
         super().__init__(row, col)
         self.type = "PASSAGE"
-        self.change_colour(BLACK)
-        PASSAGES_GROUP.add(self)
 
 class Grid():
-    def __init__(self, vertical_cells, horizontal_cells):
-        self.MAX_VER_TILES = vertical_cells*2+1
-        self.MAX_HOR_TILES = horizontal_cells*2+1
+    def __init__(self, vertical_cells, horizontal_cells, model=None):
+        # The maze itself is kept in a MazeModel, one byte per tile, and
+        # nothing else is kept for each tile. A model that is already carved
+        # can be given instead.
+        if model == None:
+            model = MazeModel(vertical_cells, horizontal_cells)
+        self.model = model
+        self.MAX_VER_TILES = self.model.MAX_VER_TILES
+        self.MAX_HOR_TILES = self.model.MAX_HOR_TILES
         # Total pixels that the grid will take up.
         self.total_ver_pixels = self.MAX_VER_TILES*TILE_PIXELS
         self.total_hor_pixels = self.MAX_HOR_TILES*TILE_PIXELS
-        # Initialize a grid of walls, cells, and passages.
-        self.grid = [[self.__generate_cell_or_wall(row, col) for col in range(0, self.MAX_HOR_TILES)] for row in range(0, self.MAX_VER_TILES)]
+        self.renderer = ChunkRenderer(self.model)
+        # Made the first time the map is drawn, as its size isn't known yet.
+        self.minimap = None
+        # Functions called with the row and column of any tile that changes.
+        self.listeners = [self.renderer.invalidate]
+        # Items on the floor, by (row, col).
+        self.items = {}
 
-    # Given coordinates, returns the correct tile to be placed.
-    def __generate_cell_or_wall(self, row, col):
-        if row % 2 != 0 and col % 2 != 0:
+    # Given coordinates, returns a tile matching the model.
+    def get_tile(self, row, col):
+        tile_type = self.model.get_type(row, col)
+        if tile_type == CELL:
             return Cell(row, col)
+        elif tile_type == PASSAGE:
+            return Passage(row, col)
         else:
-            if row % 2 == 0 and col % 2 == 0:
-                return Wall(row, col, True)
-            elif row == 0 or col == 0 or row == self.MAX_VER_TILES-1 or col == self.MAX_HOR_TILES-1:
-                return Wall(row, col, True)
-            else:
-                return Wall(row, col, False)
-
-    # Update's the tiles' positions, as each tile's initial pixel position is
-    # (0, 0).
-    def update_tile_pos(self):
-        count1 = 0
-        count2 = 0
-        for row in self.grid:
-            for tile in row:
-                tile.rect.update(count1, count2, TILE_PIXELS, TILE_PIXELS)  
-                count1 += TILE_PIXELS
-            count1 = 0
-            count2 += TILE_PIXELS
-        # Weird bug occured where every wall tile was duplicated. This is a
-        # short-term fix.
-        pygame.sprite.spritecollide(self.get_tile(0, 0), WALLS_GROUP, True)
-        WALLS_GROUP.add(self.get_tile(0, 0))
-        TILES_GROUP.add(self.get_tile(0, 0))
-        CAMERA_GROUP.add(self.get_tile(0, 0))
+            return Wall(row, col, self.model.is_special(row, col), self.model.is_exit(row, col))
 
-    def get_tile(self, row, col):
-        return self.grid[row][col]
+    # Returns the rect a tile takes up, in maze pixels.
+    def get_tile_rect(self, row, col):
+        return pygame.Rect(col*TILE_PIXELS, row*TILE_PIXELS, TILE_PIXELS, TILE_PIXELS)
+
+    # Returns the row and column of every wall that a rect overlaps, row by
+    # row. Only the few tiles under the rect are looked at.
+    def get_walls_touching(self, rect):
+        first_row, last_row, first_col, last_col = self.get_visible_range(rect)
+        walls = []
+        for row in range(first_row, last_row+1):
+            for col in range(first_col, last_col+1):
+                if self.model.is_wall(row, col):
+                    walls.append((row, col))
+        return walls
+
+    # Changes the type of a single tile, for example when the BREAK item turns
+    # a wall into a passage. Everything listening is told about it, so it
+    # costs the same in any size of maze.
+    def set_tile(self, row, col, tile_type):
+        self.model.set_type(row, col, tile_type)
+        self.tile_changed(row, col)
+
+    # Returns the row and column of the tile that a pixel position in the maze
+    # is on. Tiles are laid out edge to edge from (0, 0), so this is just a
+    # division.
+    def pixel_to_tile(self, pos):
+        return pos[1]//TILE_PIXELS, pos[0]//TILE_PIXELS
+
+    # Returns the first and last row and column of the tiles that overlap a
+    # rect in maze pixels, kept inside the grid. The range is empty if the
+    # rect doesn't overlap the maze at all.
+    def get_visible_range(self, view_rect):
+        first_row = max(view_rect.top//TILE_PIXELS, 0)
+        last_row = min((view_rect.bottom-1)//TILE_PIXELS, self.MAX_VER_TILES-1)
+        first_col = max(view_rect.left//TILE_PIXELS, 0)
+        last_col = min((view_rect.right-1)//TILE_PIXELS, self.MAX_HOR_TILES-1)
+        return first_row, last_row, first_col, last_col
     
-    # Returns the unvisited cells adjacent to a target cell.
-    def get_unvisited_neighbours(self, cell):
-        unvisited_neighbours = []
-        row, col = cell.get_pos()
-        N = -2
-        E = 2
-        S = 2
-        W = -2
-        # Statements are inside try except blocks because the tile checked can
-        # be something other than a cell, or it could check outside of the
-        # grid, where tiles don't exist.
-        try:
-            if not self.get_tile(row+N, col).is_visited():
-                unvisited_neighbours.append(self.get_tile(row+N, col))
-        except Exception:
-            pass
-        try:
-            if not self.get_tile(row, col+E).is_visited():
-                unvisited_neighbours.append(self.get_tile(row, col+E))
-        except Exception:
-            pass
-        try:
-            if not self.get_tile(row+S, col).is_visited():
-                unvisited_neighbours.append(self.get_tile(row+S, col))
-        except Exception:
-            pass
-        try:
-            if not self.get_tile(row, col+W).is_visited():
-                unvisited_neighbours.append(self.get_tile(row, col+W))
-        except Exception:
-            pass
-        return unvisited_neighbours
-
-    # Changes a wall between two cells to a passage.
-    def carve_passage(self, cell1, cell2):
-        row = (cell1.row + cell2.row) // 2
-        col = (cell1.col + cell2.col) // 2
-        self.grid[row][col] = Passage(row, col)
-
-    # This algorithm was explained in the analysis section.
-    def recursive_backtracker(self, cell, loop_chance):
-        neighbours = self.get_unvisited_neighbours(cell)
-        cell.visit()
-        while len(neighbours) != 0:
-            next_cell = choice(neighbours)
-            neighbours.remove(next_cell)
-            if not next_cell.is_visited(): 
-                self.carve_passage(cell, next_cell)
-            elif random() <= loop_chance:
-                self.carve_passage(cell, next_cell)
-            self.recursive_backtracker(next_cell, loop_chance)
+    # The maze is carved in the model. Given an rng, a random.Random, the maze
+    # only depends on its seed.
+    def recursive_backtracker(self, cell, loop_chance, rng=None):
+        finish(self.recursive_backtracker_steps(cell, loop_chance, rng))
+
+    # Same as recursive_backtracker(), a step at a time. The position of each
+    # wall is yielded once it's carved in the model.
+    def recursive_backtracker_steps(self, cell, loop_chance, rng=None):
+        for wall in self.model.backtracker_steps(cell.row, cell.col, loop_chance, rng):
+            yield divmod(wall, self.MAX_HOR_TILES)
+
+    # Same as recursive_backtracker(), with any generator from maze_generators.
+    def generate(self, algorithm, cell, loop_chance, rng=None):
+        generate(self.model, algorithm, cell.row, cell.col, loop_chance, rng)
 
     # Displays the grid in a textual form. Only needed for debugging now.
     def print_grid(self):
-        for row in self.grid:
-            print()
-            for tile in row:
-                if tile.type == "WALL":
-                    print('H ', end='')
-                else:
-                    print('  ', end='')
-
-    # Returns a surface on which the map is drawn.
+        self.model.print_grid()
+
+    # Returns a surface on which the map is drawn. The same surface is kept
+    # between frames and only the tiles that changed are drawn again.
     def draw_map(self, player, enemy, tile_pixels=5):
-        map_surf = pygame.Surface((self.MAX_HOR_TILES*tile_pixels, self.MAX_VER_TILES*tile_pixels)).convert()
-        count1 = 0
-        count2 = 0
-        for row in self.grid:
-            for tile in row:
-                coords = tile.get_pos()
-                # Draws the bordering walls.
-                if coords[0] == 0 or coords[1] == 0 or coords[0] == self.MAX_VER_TILES-1 or coords[1] == self.MAX_HOR_TILES-1:
-                    pygame.draw.rect(map_surf, WHITE, pygame.Rect(count1, count2, tile_pixels, tile_pixels))
-                # Draws the player square.
-                elif tile.rect.collidepoint(player.rect.center):
-                    pygame.draw.rect(map_surf, GREY, pygame.Rect(count1, count2, tile_pixels, tile_pixels))
-                elif tile.type == "CELL":
-                    pygame.draw.rect(map_surf, tile.colour, pygame.Rect(count1, count2, tile_pixels, tile_pixels))
-                elif tile.type == "PASSAGE":
-                    pygame.draw.rect(map_surf, tile.colour, pygame.Rect(count1, count2, tile_pixels, tile_pixels))
-                # Draws the enemy only if it is on a painted tile.
-                if tile.colour == BLUE:
-                    if enemy.current_tile == tile:
-                        pygame.draw.rect(map_surf, BRIGHT_GREEN, pygame.Rect(count1, count2, tile_pixels, tile_pixels))
-                count1 += tile_pixels
-            count1 = 0
-            count2 += tile_pixels
-        return map_surf
+        if self.minimap == None or self.minimap.tile_pixels != tile_pixels:
+            if self.minimap != None:
+                self.remove_listener(self.minimap.mark_tile)
+            self.minimap = Minimap(self.model, tile_pixels)
+            self.add_listener(self.minimap.mark_tile)
+        self.minimap.update(self.pixel_to_tile(player.rect.center), enemy.current_tile.get_pos())
+        return self.minimap.surface
+
+    # Anything that keeps its own copy of the maze, like the chunk renderer,
+    # the minimap, or the distance field the enemy follows, listens for changed tiles so it
+    # can update just that tile. Collisions read the model directly, so they
+    # don't need to listen.
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    # Must be called whenever a tile changes.
+    def tile_changed(self, row, col):
+        for listener in self.listeners:
+            listener(row, col)
     
-    def get_random_cell(self):
-        # Numbers are always odd since cells reside only on odd-numbered rows
-        # and columns.
-        random_row = randrange(1, self.MAX_VER_TILES-2, 2)
-        random_col = randrange(1, self.MAX_HOR_TILES-2, 2)
-        return self.get_tile(random_row, random_col)
+    def get_random_cell(self, rng=None):
+        row, col = self.model.get_random_cell(rng)
+        return self.get_tile(row, col)
     
     def is_dead_end(self, cell):
-        walls = 0
         row, col = cell.get_pos()
-        if self.get_tile(row+1, col).type == "WALL":
-            walls += 1
-        if self.get_tile(row-1, col).type == "WALL":
-            walls += 1
-        if self.get_tile(row, col+1).type == "WALL":
-            walls += 1
-        if self.get_tile(row, col-1).type == "WALL":
-            walls += 1
-        if walls == 3:
-            return True
-        else:
-            return False
+        return self.model.is_dead_end(row, col)
     
-    def generate_items(self, chance):
-        for cell in CELLS_GROUP:
-                if self.is_dead_end(cell) and random() <= chance:
-                    row, col = cell.get_pos()
-                    if random() < 0.5:
-                        Item(row, col, "BREAK", cell.rect.center)
-                    else:
-                        Item(row, col, "JUMP", cell.rect.center)
-
-    def get_exit_wall(self):
-        # First creates a list of odd-numbered outside walls, and then picks
-        # one and returns it.
-        available_walls = []
-        for row in self.grid:
-            for tile in row:
-                pos = tile.get_pos()
-                if pos[0] == 0 or pos[1] == 0 or pos[0] == self.MAX_VER_TILES-1 or pos[1] == self.MAX_HOR_TILES-1:
-                    if pos[0] % 2 != 0 or pos[1] % 2 != 0:
-                        available_walls.append(tile)
-        chosen_wall = choice(available_walls)
-        return chosen_wall
+    # Only the given rows of cells get items, if rows is given.
+    def generate_items(self, chance, rows=None, rng=None):
+        dead_ends = analyse(self.model).get_dead_end_cells(rows)
+        for row, col, item_type in self.model.choose_items(chance, rows, dead_ends, rng):
+            self.add_item(row, col, item_type)
+
+    def add_item(self, row, col, item_type):
+        center = self.get_tile(row, col).rect.center
+        self.items[(row, col)] = Item(row, col, item_type, center)
+
+    # Removes the item on a tile and returns it, or None if there isn't one.
+    def take_item(self, pos):
+        return self.items.pop(pos, None)
+
+    # Returns the items on the tiles in a range from get_visible_range().
+    def get_items_in_range(self, visible_range):
+        first_row, last_row, first_col, last_col = visible_range
+        items = []
+        for row in range(first_row, last_row+1):
+            for col in range(first_col, last_col+1):
+                if (row, col) in self.items:
+                    items.append(self.items[(row, col)])
+        return items
+
+    def get_exit_wall(self, rng=None):
+        row, col = self.model.get_exit_wall(rng)
+        return self.get_tile(row, col)
+
+    def make_exit(self, exit_wall):
+        row, col = exit_wall.get_pos()
+        self.model.make_exit(row, col)
+        self.tile_changed(row, col)
+        exit_wall.is_exit = True
+
+    # Paints a cell or passage blue. Returns True if it wasn't painted before.
+    def paint_tile(self, tile):
+        row, col = tile.get_pos()
+        if not self.model.paint(row, col):
+            return False
+        self.tile_changed(row, col)
+        return True
     
     def get_cell_near_exit(self, exit_wall):
-        pos = exit_wall.get_pos()
-        # Similarly to "get_unvisited_neighbours()", it iterates through 
-        # possible cells.
-        try:
-            if self.get_tile(pos[0]-1, pos[1]).type == "CELL":
-                return self.get_tile(pos[0]-1, pos[1])
-        except Exception:
-            pass
-        try:
-            if self.get_tile(pos[0]+1, pos[1]).type == "CELL":
-                return self.get_tile(pos[0]+1, pos[1])
-        except Exception:
-            pass
-        try:
-            if self.get_tile(pos[0], pos[1]-1).type == "CELL":
-                return self.get_tile(pos[0], pos[1]-1)
-        except Exception:
-            pass
-        try:
-            if self.get_tile(pos[0], pos[1]+1).type == "CELL":
-                return self.get_tile(pos[0], pos[1]+1)
-        except Exception:
-            pass
-                    
+        row, col = exit_wall.get_pos()
+        return self.get_tile(*self.model.get_cell_near_exit(row, col))
+
+# The maze of the endless mode. It only holds a window of the rows of an
+# EndlessMaze, and advance() moves the window down. Everything in it moves up
+# by the rows that were dropped, so the rest of the game only ever sees an
+# ordinary Grid.
+class EndlessGrid(Grid):
+    def __init__(self, horizontal_cells, window_cell_rows, loop_chance):
+        super().__init__(window_cell_rows, horizontal_cells, EndlessMaze(horizontal_cells, window_cell_rows, loop_chance))
+        # Called with the number of rows dropped, before any tile_changed()
+        # for the new rows, by anything that keeps tiles by where they are.
+        self.rows_listeners = []
+
+    # Drops cell_rows rows of cells from the top and makes as many at the
+    # bottom. Items are put in the new rows once the walls below them are
+    # known.
+    def advance(self, cell_rows, item_chance):
+        rows = 2*cell_rows
+        self.model.advance(cell_rows)
+        moved = rows*TILE_PIXELS
+        items = {}
+        for (row, col), item in self.items.items():
+            if row - rows > 0:
+                item.row -= rows
+                item.rect.move_ip(0, -moved)
+                items[(row-rows, col)] = item
+        self.items = items
+        # The top row was walled off, the walls in the row of cells under it
+        # carved, and the old bottom row and everything under it is new.
+        changed = [0, 1] + list(range(self.MAX_VER_TILES-1-rows, self.MAX_VER_TILES))
+        self.renderer.rows_removed(rows)
+        if self.minimap != None:
+            self.minimap.rows_removed(rows)
+        for listener in self.rows_listeners:
+            listener(rows)
+        for row in changed:
+            for col in range(self.MAX_HOR_TILES):
+                self.tile_changed(row, col)
+        self.generate_items(item_chance, range(self.MAX_VER_TILES-2-rows, self.MAX_VER_TILES-2, 2))
+
 class Player(pygame.sprite.Sprite):
-    def __init__(self, starting_cell):
+    def __init__(self, starting_cell, world):
         super().__init__()
-        self.image = pygame.Surface((TILE_PIXELS//2, TILE_PIXELS//2)).convert()
+        self.image = new_surface((TILE_PIXELS//2, TILE_PIXELS//2))
         self.image.fill(GREY)
         self.rect = self.image.get_rect()
         self.rect.center = starting_cell.rect.center
         self.speed = TILE_PIXELS//10
         self.item_break = 1
         self.item_jump = 1
-        PLAYER_GROUP.add(self)
-        CAMERA_GROUP.add(self)
+        world.camera.add_to_layer(self, ACTORS_LAYER)
         
-    # Returns a cell or passage which collides with the center of the player's 
-    # rect.
-    def get_current_tile(self):
-        center = self.rect.center
-        for cell in CELLS_GROUP:
-            if cell.rect.collidepoint(center):
-                return cell
-        for passage in PASSAGES_GROUP:
-            if passage.rect.collidepoint(center):
-                return passage
+    # Returns the tile which the center of the player's rect is on.
+    def get_current_tile(self, maze):
+        row, col = maze.pixel_to_tile(self.rect.center)
+        return maze.get_tile(row, col)
 
     def use_item(self, item):
         if item == "BREAK" and self.item_break > 0:
@@ -343,115 +391,290 @@ class Player(pygame.sprite.Sprite):
             self.item_jump -= 1
 
     # Method responsible for player movement and collision. In the case of
-    # touching the enemy or the exit, a value is returned.
-    def update(self, item_used, maze, elem):
-        pressed_keys = pygame.key.get_pressed()
+    # touching the enemy or the exit, a value is returned. The inputs are the
+    # actions for this tick, see World.step().
+    def update(self, inputs, maze, world):
+        item_used = None
+        if "BREAK" in inputs:
+            item_used = "BREAK"
+        elif "JUMP" in inputs:
+            item_used = "JUMP"
         h_vel = 0
         v_vel = 0
 
-        if pygame.sprite.spritecollideany(self, ENEMY_GROUP):
+        if pygame.sprite.spritecollideany(self, world.enemy_group):
             return "ENEMY"
 
         # Colour the cells and passages upon collision and collect items.
-        touched_tile = self.get_current_tile()
-        if touched_tile.colour != BLUE:
-            touched_tile.change_colour(BLUE)
-            elem.add_to_score(10)
-        # Picks up items.
-        for item in ITEMS_GROUP:
-            if (item.row, item.col) == touched_tile.get_pos():
-                item.kill()
-                if item.type == "BREAK":
-                    self.item_break += 1
-                elif item.type == "JUMP":
-                    self.item_jump += 1
-                elem.add_to_score(100)
+        touched_tile = self.get_current_tile(maze)
+        if maze.paint_tile(touched_tile):
+            world.add_to_score(10)
+        # Picks up the item on the tile, if there is one.
+        item = maze.take_item(touched_tile.get_pos())
+        if item != None:
+            if item.type == "BREAK":
+                self.item_break += 1
+            elif item.type == "JUMP":
+                self.item_jump += 1
+            world.add_to_score(100)
 
         # Horizontal movement.
-        if pressed_keys[pygame.K_LEFT]:
+        distance = 0
+        if "LEFT" in inputs:
             h_vel = -self.speed
-            self.rect.move_ip(h_vel, 0)
-        if pressed_keys[pygame.K_RIGHT]:
+            distance += h_vel
+        if "RIGHT" in inputs:
             h_vel = self.speed
-            self.rect.move_ip(h_vel, 0)
+            distance += h_vel
+        if self.move(h_vel, 0, distance, item_used, maze) == "EXIT":
+            return "EXIT"
 
-        # Checks for collided walls and prevents movement.
-        collided_walls = pygame.sprite.spritecollide(self, WALLS_GROUP, False)
-        for wall in collided_walls:
-            if wall.is_exit:
+        # Code repeated for vertical movement.
+        distance = 0
+        if "UP" in inputs:
+            v_vel = -self.speed
+            distance += v_vel
+        if "DOWN" in inputs:
+            v_vel = self.speed
+            distance += v_vel
+        if self.move(0, v_vel, distance, item_used, maze) == "EXIT":
+            return "EXIT"
+
+    # Moves the player along one axis. The distance is split into steps no
+    # longer than MAX_MOVE_STEP, and walls are checked after each one, so fast
+    # movement can't pass through a wall. Movement stops at the first wall hit.
+    def move(self, h_vel, v_vel, distance, item_used, maze):
+        steps = max(1, -(-abs(distance)//MAX_MOVE_STEP))
+        for step in range(steps):
+            part = distance*(step+1)//steps - distance*step//steps
+            if h_vel != 0:
+                self.rect.move_ip(part, 0)
+            else:
+                self.rect.move_ip(0, part)
+            status = self.collide(h_vel, v_vel, item_used, maze)
+            if status != None:
+                return status
+
+    # Checks for collided walls and prevents movement. Returns "EXIT" if the
+    # exit was touched, or "WALL" if any other wall was.
+    def collide(self, h_vel, v_vel, item_used, maze):
+        collided_walls = maze.get_walls_touching(self.rect)
+        for row, col in collided_walls:
+            wall_rect = maze.get_tile_rect(row, col)
+            if maze.model.is_exit(row, col):
                 return "EXIT"
+            special = maze.model.is_special(row, col)
             if h_vel > 0:
-                self.rect.right = wall.rect.left
+                self.rect.right = wall_rect.left
                 # Allows to use the items.
-                if not wall.special and item_used != None:
+                if not special and item_used != None:
                     if item_used == "JUMP" and self.item_jump > 0:
-                        if self.rect.top >= wall.rect.top and self.rect.bottom <= wall.rect.bottom:
+                        if self.rect.top >= wall_rect.top and self.rect.bottom <= wall_rect.bottom:
                             self.use_item("JUMP")
-                            self.rect.left = wall.rect.right
+                            self.rect.left = wall_rect.right
                     elif item_used == "BREAK" and self.item_break > 0:
                         self.use_item("BREAK")
-                        row, col = wall.get_pos()
-                        wall.kill()
-                        maze.grid[row][col] = Passage(row, col)
-                        maze.update_tile_pos()
+                        maze.set_tile(row, col, PASSAGE)
             # Code repeated for negative horizontal velocity.
             elif h_vel < 0:
-                self.rect.left = wall.rect.right
-                if not wall.special and item_used != None:
+                self.rect.left = wall_rect.right
+                if not special and item_used != None:
                     if item_used == "JUMP" and self.item_jump > 0:
-                        if self.rect.top >= wall.rect.top and self.rect.bottom <= wall.rect.bottom:
+                        if self.rect.top >= wall_rect.top and self.rect.bottom <= wall_rect.bottom:
                             self.use_item("JUMP")
-                            self.rect.right = wall.rect.left
+                            self.rect.right = wall_rect.left
                     elif item_used == "BREAK" and self.item_break > 0:
                         self.use_item("BREAK")
-                        row, col = wall.get_pos()
-                        wall.kill()
-                        maze.grid[row][col] = Passage(row, col)
-                        maze.update_tile_pos()
-        
-        # Code repeated for vertical movement.
-        if pressed_keys[pygame.K_UP]:
-            v_vel = -self.speed
-            self.rect.move_ip(0, v_vel)
-        if pressed_keys[pygame.K_DOWN]:
-            v_vel = self.speed
-            self.rect.move_ip(0, v_vel)
-        
-        collided_walls = pygame.sprite.spritecollide(self, WALLS_GROUP, False)
-        for wall in collided_walls:
-            if wall.is_exit:
-                return "EXIT"
-            if v_vel > 0:
-                self.rect.bottom = wall.rect.top
-                if not wall.special and item_used != None:
+                        maze.set_tile(row, col, PASSAGE)
+            # Code repeated for vertical movement.
+            elif v_vel > 0:
+                self.rect.bottom = wall_rect.top
+                if not special and item_used != None:
                     if item_used == "JUMP" and self.item_jump > 0:
-                        if self.rect.left >= wall.rect.left and self.rect.right <= wall.rect.right:
+                        if self.rect.left >= wall_rect.left and self.rect.right <= wall_rect.right:
                             self.use_item("JUMP")
-                            self.rect.top = wall.rect.bottom
+                            self.rect.top = wall_rect.bottom
                     elif item_used == "BREAK" and self.item_break > 0:
                         self.use_item("BREAK")
-                        row, col = wall.get_pos()
-                        wall.kill()
-                        maze.grid[row][col] = Passage(row, col)
-                        maze.update_tile_pos()
-                        
+                        maze.set_tile(row, col, PASSAGE)
             elif v_vel < 0:
-                self.rect.top = wall.rect.bottom
-                if not wall.special and item_used != None:
+                self.rect.top = wall_rect.bottom
+                if not special and item_used != None:
                     if item_used == "JUMP" and self.item_jump > 0:
-                        if self.rect.left >= wall.rect.left and self.rect.right <= wall.rect.right:
+                        if self.rect.left >= wall_rect.left and self.rect.right <= wall_rect.right:
                             self.use_item("JUMP")
-                            self.rect.bottom = wall.rect.top
+                            self.rect.bottom = wall_rect.top
                     elif item_used == "BREAK" and self.item_break > 0:
                         self.use_item("BREAK")
-                        row, col = wall.get_pos()
-                        wall.kill()
-                        maze.grid[row][col] = Passage(row, col)
-                        maze.update_tile_pos()
+                        maze.set_tile(row, col, PASSAGE)
+        if len(collided_walls) != 0:
+            return "WALL"
+
+# Bakes the maze into surfaces of CHUNK_TILES by CHUNK_TILES tiles, so that
+# drawing the maze only needs a few blits per frame. Chunks are baked when
+# they first come into view, and the least recently used ones are dropped
+# once there are more than MAX_CHUNKS of them.
+class ChunkRenderer():
+    def __init__(self, model):
+        self.model = model
+        self.chunk_pixels = CHUNK_TILES*TILE_PIXELS
+        # (chunk row, chunk col) -> surface, oldest first.
+        self.chunks = OrderedDict()
+
+    # Returns the colour a tile is drawn in, based on its type and flags.
+    def get_tile_colour(self, row, col):
+        if self.model.is_wall(row, col):
+            if self.model.is_exit(row, col):
+                return BLACK
+            elif self.model.is_special(row, col):
+                return LIGHT_GREY
+            else:
+                return WHITE
+        elif self.model.is_painted(row, col):
+            return BLUE
+        else:
+            return BLACK
+
+    # Draws every tile inside a chunk onto a new surface.
+    def bake_chunk(self, chunk_row, chunk_col):
+        first_row = chunk_row*CHUNK_TILES
+        first_col = chunk_col*CHUNK_TILES
+        last_row = min(first_row+CHUNK_TILES, self.model.MAX_VER_TILES)
+        last_col = min(first_col+CHUNK_TILES, self.model.MAX_HOR_TILES)
+        chunk_surf = new_surface(((last_col-first_col)*TILE_PIXELS, (last_row-first_row)*TILE_PIXELS))
+        chunk_surf.fill(BLACK)
+        for row in range(first_row, last_row):
+            for col in range(first_col, last_col):
+                colour = self.get_tile_colour(row, col)
+                if colour != BLACK:
+                    chunk_surf.fill(colour, ((col-first_col)*TILE_PIXELS, (row-first_row)*TILE_PIXELS, TILE_PIXELS, TILE_PIXELS))
+        return chunk_surf
+
+    # Returns a chunk's surface, baking it first if it isn't cached.
+    def get_chunk(self, chunk_row, chunk_col):
+        key = (chunk_row, chunk_col)
+        if key in self.chunks:
+            self.chunks.move_to_end(key)
+        else:
+            self.chunks[key] = self.bake_chunk(chunk_row, chunk_col)
+            if len(self.chunks) > MAX_CHUNKS:
+                self.chunks.popitem(last=False)
+        return self.chunks[key]
+
+    # Must be called when a tile changes, so its chunk gets baked again.
+    def invalidate(self, row, col):
+        self.chunks.pop((row//CHUNK_TILES, col//CHUNK_TILES), None)
+
+    # Must be called when rows are dropped from the top of the model. If they
+    # are whole chunks, the chunks left just move up.
+    def rows_removed(self, rows):
+        if rows % CHUNK_TILES != 0:
+            self.chunks.clear()
+            return
+        chunk_rows = rows//CHUNK_TILES
+        self.chunks = OrderedDict(((chunk_row-chunk_rows, chunk_col), chunk_surf)
+                                  for (chunk_row, chunk_col), chunk_surf in self.chunks.items() if chunk_row >= chunk_rows)
+
+    # Blits the chunks holding the visible range of tiles. The view rect is in
+    # maze pixels.
+    def draw(self, display, view_rect, visible_range, offset):
+        first_row, last_row, first_col, last_col = visible_range
+        for chunk_row in range(first_row//CHUNK_TILES, last_row//CHUNK_TILES+1):
+            for chunk_col in range(first_col//CHUNK_TILES, last_col//CHUNK_TILES+1):
+                chunk_surf = self.get_chunk(chunk_row, chunk_col)
+                # Only the part of the chunk inside the view is blitted, so
+                # nothing is drawn over the HUD.
+                chunk_rect = pygame.Rect(chunk_col*self.chunk_pixels, chunk_row*self.chunk_pixels, chunk_surf.get_width(), chunk_surf.get_height())
+                visible = chunk_rect.clip(view_rect)
+                area = visible.move(-chunk_rect.left, -chunk_rect.top)
+                display.blit(chunk_surf, (visible.left-offset[0], visible.top-offset[1]), area)
+
+# The map shown in the HUD. Its surface is kept between frames, and only the
+# tiles that were marked as changed, or that the player or enemy marker moved
+# on or off, are drawn again.
+class Minimap():
+    def __init__(self, model, tile_pixels):
+        self.model = model
+        self.tile_pixels = tile_pixels
+        self.surface = new_surface((model.MAX_HOR_TILES*tile_pixels, model.MAX_VER_TILES*tile_pixels))
+        self.surface.fill(BLACK)
+        self.dirty = set()
+        self.player_pos = None
+        self.enemy_pos = None
+        # How many tiles were drawn and how long it took, in milliseconds,
+        # the last time the map was updated.
+        self.last_tiles_drawn = 0
+        self.last_time = 0
+        # Only the border is drawn at the start, as everything else is black.
+        last_row = model.MAX_VER_TILES-1
+        last_col = model.MAX_HOR_TILES-1
+        for row in range(model.MAX_VER_TILES):
+            self.dirty.add((row, 0))
+            self.dirty.add((row, last_col))
+        for col in range(model.MAX_HOR_TILES):
+            self.dirty.add((0, col))
+            self.dirty.add((last_row, col))
+
+    def mark_tile(self, row, col):
+        self.dirty.add((row, col))
 
-class Camera(pygame.sprite.Group):
+    # Must be called when rows are dropped from the top of the model. The map,
+    # and anything waiting to be drawn on it, moves up with them, and the rows
+    # made at the bottom have to be marked as well.
+    def rows_removed(self, rows):
+        self.surface.scroll(0, -rows*self.tile_pixels)
+        self.dirty = {(row-rows, col) for row, col in self.dirty if row >= rows}
+        if self.player_pos != None:
+            self.player_pos = (self.player_pos[0]-rows, self.player_pos[1])
+        if self.enemy_pos != None:
+            self.enemy_pos = (self.enemy_pos[0]-rows, self.enemy_pos[1])
+
+    # Returns the colour a tile should be on the map.
+    def get_tile_colour(self, row, col):
+        # Draws the bordering walls.
+        if row == 0 or col == 0 or row == self.model.MAX_VER_TILES-1 or col == self.model.MAX_HOR_TILES-1:
+            return WHITE
+        painted = self.model.is_painted(row, col)
+        # Draws the enemy only if it is on a painted tile.
+        if painted and (row, col) == self.enemy_pos:
+            return BRIGHT_GREEN
+        elif (row, col) == self.player_pos:
+            return GREY
+        elif painted:
+            return BLUE
+        else:
+            return BLACK
+
+    # Moves the markers and draws every tile that changed since last time.
+    def update(self, player_pos, enemy_pos):
+        start_time = perf_counter()
+        if player_pos != self.player_pos:
+            self.dirty.add(self.player_pos)
+            self.dirty.add(player_pos)
+            self.player_pos = player_pos
+        if enemy_pos != self.enemy_pos:
+            self.dirty.add(self.enemy_pos)
+            self.dirty.add(enemy_pos)
+            self.enemy_pos = enemy_pos
+        self.dirty.discard(None)
+        tile_pixels = self.tile_pixels
+        for row, col in self.dirty:
+            if self.model.in_bounds(row, col):
+                self.surface.fill(self.get_tile_colour(row, col), (col*tile_pixels, row*tile_pixels, tile_pixels, tile_pixels))
+        self.last_tiles_drawn = len(self.dirty)
+        self.dirty.clear()
+        self.last_time = (perf_counter()-start_time)*1000
+
+# Draws everything relative to the player. Sprites that move are put in one
+# of the render layers, which are drawn in order, so the player and enemy
+# always end up on top without sorting anything. Items are drawn from the
+# maze's item index instead, under every layer.
+class Camera():
     def __init__(self):
-        super().__init__()
+        self.layers = [pygame.sprite.Group()]
+
+    def add_to_layer(self, sprite, layer):
+        self.layers[layer].add(sprite)
 
     # Calculates the X and Y offset required to keep the sprite in the center
     # of the screen.
@@ -461,129 +684,104 @@ class Camera(pygame.sprite.Group):
         return offset_x, offset_y
     
     # Overrides the default draw method, with the addition of centering the
-    # camera on the player and only drawing entities that are on screen.
-    def draw(self, display, offset_sprite):
+    # camera on the player and only drawing what is on screen. Which tiles are
+    # visible is worked out from the offset, so the cost doesn't depend on
+    # the size of the maze.
+    def draw(self, display, offset_sprite, maze):
         offset = self.calculate_offset(offset_sprite)
-        for sprite in sorted(self, key = lambda sprite: sprite in PLAYER_GROUP or sprite in ENEMY_GROUP):
-            # Only blit something if it is visible on the screen.
-            if sprite.rect.colliderect(pygame.Rect(280+offset[0], offset[1], 720, 720)):
-                new_pos = ((sprite.rect.topleft[0] - offset[0]), (sprite.rect.topleft[1] - offset[1]))
-                display.blit(sprite.image, new_pos)
+        view_rect = pygame.Rect(280+offset[0], offset[1], 720, 720)
+        visible_range = maze.get_visible_range(view_rect)
+        maze.renderer.draw(display, view_rect, visible_range, offset)
+        for item in maze.get_items_in_range(visible_range):
+            display.blit(item.image, (item.rect.left - offset[0], item.rect.top - offset[1]))
+        for layer in self.layers:
+            for sprite in layer:
+                # Only blit something if it is visible on the screen.
+                if sprite.rect.colliderect(view_rect):
+                    new_pos = ((sprite.rect.topleft[0] - offset[0]), (sprite.rect.topleft[1] - offset[1]))
+                    display.blit(sprite.image, new_pos)
 
 # Both item types are created using this class.
 class Item(pygame.sprite.Sprite):
     def __init__(self, row, col, type, new_center):
         super().__init__()
         self.type = type
-        if self.type == "BREAK":
-            self.image = BREAK_TEXTURE
-        elif self.type == "JUMP":
-            self.image = JUMP_TEXTURE
+        self.image = TEXTURES[self.type]
         self.rect = self.image.get_rect(center=(new_center))
         self.row = row
         self.col = col
-        ITEMS_GROUP.add(self)
-        CAMERA_GROUP.add(self)
 
+# The HUD and the menus, drawn onto the window.
 class GameElements():
-    def __init__(self):
+    def __init__(self, display):
+        self.display = display
         # HUD elements.
         self.border1 = pygame.Rect(0, 0, 280, 720)
         self.border2 = pygame.Rect(1000, 0, 280, 720)
-        self.break_2x = pygame.transform.scale2x(BREAK_TEXTURE).convert_alpha()
-        self.jump_2x = pygame.transform.scale2x(JUMP_TEXTURE).convert_alpha()
+        self.break_2x = pygame.transform.scale2x(TEXTURES["BREAK"]).convert_alpha()
+        self.jump_2x = pygame.transform.scale2x(TEXTURES["JUMP"]).convert_alpha()
         self.score_title = BIG_FONT.render("SCORE", False, WHITE)
         self.time_title = BIG_FONT.render("TIME", False, WHITE)
         self.info_break = BIG_FONT.render("'Z' - ITEM1", False, WHITE)
         self.info_jump = BIG_FONT.render("'X' - ITEM2", False, WHITE)
         self.info_menu = BIG_FONT.render("'ESC'-MENU", False, WHITE)
         # Variables.
-        self.time_at_start = 0
-        self.time = 0
-        self.score = 0
         self.main = True
         self.options = False
 
-    # METHODS
-    def start_timer(self, time):
-        self.time_at_start = time
-        self.time = self.time_at_start
-        self.score = self.time*5
-        pygame.time.set_timer(TIMER_EVENT, 1000)
-
-    def add_to_score(self, amount):
-        self.score += amount
-    
-    def second_passed(self):
-        self.time -= 1
-
-    # Returns as string with seconds converted to minutes and seconds.
-    def get_time_str(self):
-        minutes = self.time // 60
-        seconds = self.time % 60
-        if seconds < 10:
-            seconds = "0" + str(seconds)
-        else:
-            seconds = str(seconds)
-        if minutes < 10:
-            minutes = "0" + str(minutes)
-        else:
-            minutes = str(minutes)
-        return minutes + ":" + seconds
-
     # HUD METHODS
     def draw_borders(self):
-        pygame.draw.rect(display_surface, DARK_GREY, self.border1)
-        pygame.draw.rect(display_surface, DARK_GREY, self.border2)
+        pygame.draw.rect(self.display, DARK_GREY, self.border1)
+        pygame.draw.rect(self.display, DARK_GREY, self.border2)
     
     def draw_items_counter(self, player):
         # Draws the boxes around the items
-        pygame.draw.rect(display_surface, WHITE, (1046, 590, 70, 70), 5)
-        pygame.draw.rect(display_surface, WHITE, (1162, 590, 70, 70), 5)
+        pygame.draw.rect(self.display, WHITE, (1046, 590, 70, 70), 5)
+        pygame.draw.rect(self.display, WHITE, (1162, 590, 70, 70), 5)
         # Draw the item icons in the boxes.
-        display_surface.blit(self.break_2x, (1046, 590))
-        display_surface.blit(self.jump_2x, (1162, 590))
+        self.display.blit(self.break_2x, (1046, 590))
+        self.display.blit(self.jump_2x, (1162, 590))
         # Renders the item counts and draws them.
         text_break_count = SMALL_FONT.render(str(player.item_break), False, WHITE)
         text_jump_count = SMALL_FONT.render(str(player.item_jump), False, WHITE)
-        display_surface.blit(text_break_count, (1078, 665))
-        display_surface.blit(text_jump_count, (1194, 665))
+        self.display.blit(text_break_count, (1078, 665))
+        self.display.blit(text_jump_count, (1194, 665))
     
     def draw_map(self, maze_map):
-        display_surface.blit(maze_map, (((280-maze_map.get_width())//2), ((280-maze_map.get_width())//2)))
+        self.display.blit(maze_map, (((280-maze_map.get_width())//2), ((280-maze_map.get_width())//2)))
     
-    def draw_score(self):
+    def draw_score(self, score):
         # Widths.
         border_width = self.border1.width
         title_width = self.score_title.get_width()
-        text_score = BIG_FONT.render(str(self.score), False, WHITE)
+        text_score = BIG_FONT.render(str(score), False, WHITE)
         score_width = text_score.get_width()
         # Blitting.
-        display_surface.blit(self.score_title, ((border_width-title_width)//2, 440))
-        display_surface.blit(text_score, ((border_width-score_width)//2, 495))
+        self.display.blit(self.score_title, ((border_width-title_width)//2, 440))
+        self.display.blit(text_score, ((border_width-score_width)//2, 495))
     
-    def draw_timer(self):
+    def draw_timer(self, time_str):
         # Widths.
         border_width = self.border1.width
         title_width = self.time_title.get_width()
-        text_time = BIG_FONT.render(self.get_time_str(), False, WHITE)
+        text_time = BIG_FONT.render(time_str, False, WHITE)
         time_width = text_time.get_width()
         # Blitting.
-        display_surface.blit(self.time_title, ((border_width-title_width)//2, 580))
-        display_surface.blit(text_time, ((border_width-time_width)//2, 635))
+        self.display.blit(self.time_title, ((border_width-title_width)//2, 580))
+        self.display.blit(text_time, ((border_width-time_width)//2, 635))
     
     def draw_tips(self):
-        display_surface.blit(self.info_break, (1015, 15))
-        display_surface.blit(self.info_jump, (1015, 115))
-        display_surface.blit(self.info_menu, (1000, 215))
+        self.display.blit(self.info_break, (1015, 15))
+        self.display.blit(self.info_jump, (1015, 115))
+        self.display.blit(self.info_menu, (1000, 215))
     
     # Draws all the HUD elements together.
-    def draw_hud(self, maze_map, player):
+    def draw_hud(self, maze_map, world):
         self.draw_borders()
-        self.draw_items_counter(player)
+        self.draw_items_counter(world.player)
         self.draw_map(maze_map)
-        self.draw_score()
-        self.draw_timer()
+        self.draw_score(world.score)
+        self.draw_timer(world.get_time_str())
         self.draw_tips()
 
     # MENU METHODS
@@ -595,13 +793,16 @@ class GameElements():
         medium_rect = medium.get_rect(topleft=((MAX_WIDTH-medium.get_width())//2, 275))
         hard = BIG_FONT.render("HARD", False, pygame.Color("red"))
         hard_rect = hard.get_rect(topleft=((MAX_WIDTH-hard.get_width())//2, 350))
+        endless = BIG_FONT.render("ENDLESS", False, pygame.Color("purple"))
+        endless_rect = endless.get_rect(topleft=((MAX_WIDTH-endless.get_width())//2, 425))
         exit = BIG_FONT.render("EXIT", False, WHITE)
         exit_rect = exit.get_rect(topleft=((MAX_WIDTH-exit.get_width())//2, 500))
         # Blitting.
-        display_surface.blit(easy, easy_rect)
-        display_surface.blit(medium, medium_rect)
-        display_surface.blit(hard, hard_rect)
-        display_surface.blit(exit, exit_rect)
+        self.display.blit(easy, easy_rect)
+        self.display.blit(medium, medium_rect)
+        self.display.blit(hard, hard_rect)
+        self.display.blit(endless, endless_rect)
+        self.display.blit(exit, exit_rect)
         # Input.
         mouse_pos = pygame.mouse.get_pos()
         if lmb_clicked:
@@ -617,6 +818,10 @@ class GameElements():
                 self.main = True
                 self.options = False
                 return "HARD"
+            elif endless_rect.collidepoint(mouse_pos):
+                self.main = True
+                self.options = False
+                return "ENDLESS"
             elif exit_rect.collidepoint(mouse_pos):
                 return "EXIT"
 
@@ -627,8 +832,8 @@ class GameElements():
         exit = BIG_FONT.render("EXIT", False, WHITE)
         exit_rect = exit.get_rect(topleft=((MAX_WIDTH-exit.get_width())//2, 500))
         # Blitting.
-        display_surface.blit(start, start_rect)
-        display_surface.blit(exit, exit_rect)
+        self.display.blit(start, start_rect)
+        self.display.blit(exit, exit_rect)
         # Input.
         mouse_pos = pygame.mouse.get_pos()
         if lmb_clicked:
@@ -654,20 +859,54 @@ class GameElements():
             else:
                 return status
     
+    # Shows how far the maze is through being made, and the maze itself if a
+    # model is given. Returns "CANCEL" if it's clicked.
+    def loading_screen(self, lmb_clicked, progress, model=None):
+        loading = BIG_FONT.render("LOADING", False, WHITE)
+        self.display.blit(loading, ((MAX_WIDTH-loading.get_width())//2, 40))
+        if model != None:
+            self.draw_carving(model, pygame.Rect((MAX_WIDTH-360)//2, 110, 360, 360))
+        bar = pygame.Rect((MAX_WIDTH-500)//2, 500, 500, 40)
+        pygame.draw.rect(self.display, GREY, (bar.x, bar.y, int(bar.width*progress), bar.height))
+        pygame.draw.rect(self.display, WHITE, bar, 5)
+        percent = SMALL_FONT.render("%d%%" % (progress*100), False, WHITE)
+        self.display.blit(percent, ((MAX_WIDTH-percent.get_width())//2, 555))
+        cancel = BIG_FONT.render("CANCEL", False, WHITE)
+        cancel_rect = cancel.get_rect(topleft=((MAX_WIDTH-cancel.get_width())//2, 610))
+        self.display.blit(cancel, cancel_rect)
+        # Input.
+        mouse_pos = pygame.mouse.get_pos()
+        if lmb_clicked and cancel_rect.collidepoint(mouse_pos):
+            return "CANCEL"
+
+    # Draws a maze that is being carved, scaled to fit in a rect. The tile
+    # bytes are turned into colours with one lookup and used as the pixels of
+    # a surface, a pixel per tile, so even a huge maze is quick to draw.
+    def draw_carving(self, model, rect):
+        width = model.MAX_HOR_TILES
+        height = model.MAX_VER_TILES
+        pixels = model.tiles.translate(CARVING_COLOURS)
+        surface = pygame.image.frombuffer(pixels, (width, height), "P")
+        surface.set_palette(CARVING_PALETTE)
+        scale = min(rect.width/width, rect.height/height)
+        size = (int(width*scale), int(height*scale))
+        surface = pygame.transform.scale(surface, size)
+        self.display.blit(surface, (rect.centerx-size[0]//2, rect.centery-size[1]//2))
+
     def pause_menu(self, lmb_clicked):
         # Blitting the box.
         centre = [0, 0]
         centre[0] = (MAX_WIDTH-250)//2
         centre[1] = (MAX_HEIGHT-200)//2
-        pygame.draw.rect(display_surface, DARK_GREY, ((centre), (250, 200)))
-        pygame.draw.rect(display_surface, WHITE, ((centre), (250, 200)), 5)
+        pygame.draw.rect(self.display, DARK_GREY, ((centre), (250, 200)))
+        pygame.draw.rect(self.display, WHITE, ((centre), (250, 200)), 5)
         # Blitting the text.
         resume = BIG_FONT.render("RESUME", False, WHITE)
         resume_rect = resume.get_rect(topleft=((MAX_WIDTH-resume.get_width())//2, 300))
         exit = BIG_FONT.render("EXIT", False, WHITE)
         exit_rect = exit.get_rect(topleft=((MAX_WIDTH-exit.get_width())//2, 380))
-        display_surface.blit(resume, resume_rect)
-        display_surface.blit(exit, exit_rect)
+        self.display.blit(resume, resume_rect)
+        self.display.blit(exit, exit_rect)
         # Input.
         mouse_pos = pygame.mouse.get_pos()
         if lmb_clicked:
@@ -677,57 +916,21 @@ class GameElements():
                 return "EXIT"
 
 class Enemy(pygame.sprite.Sprite):
-    def __init__(self, starting_tile):
+    def __init__(self, starting_tile, world):
         super().__init__()
-        self.image = pygame.Surface((TILE_PIXELS, TILE_PIXELS)).convert()
+        self.image = new_surface((TILE_PIXELS, TILE_PIXELS))
         self.image.fill(BRIGHT_GREEN)
         self.rect = self.image.get_rect()
         self.rect.center = starting_tile.rect.center
         self.speed = TILE_PIXELS//10
-        # Path grid - matrix converted to node objects that A* can use.
-        self.pathgrid = None
-        # The A* algorithm.
-        self.path_finder = AStarFinder()
+        # Asked which way the player is, with World.get_chase_step().
+        self.world = world
         # Parameters required for movement.
-        self.path = []
         self.current_tile = starting_tile
-        self.next_tile = None
-        ENEMY_GROUP.add(self)
-        CAMERA_GROUP.add(self) 
-
-    # Generate a matrix based on the grid, and then update the path grid.
-    def update_pathgrid(self, grid):
-        # Matrix is a representation of the maze using 1s and 0s.
-        # 1 - TRAVERSABLE TILE
-        # 0 - WALL
-        matrix = [[self.__generate_1_or_0(tile) for tile in row] for row in grid.grid]
-        self.pathgrid = PathGrid(matrix=matrix)
-    
-    def __generate_1_or_0(self, tile):
-        if tile.type == "WALL":
-            return 0
-        else:
-            return 1
-    
-    # Creates a path made from one tile to another using the A* algorithm and
-    # updates its path and the next tile.
-    def update_path(self, maze, tile1, tile2):
-        coords1 = tile1.get_pos()
-        coords2 = tile2.get_pos()
-        start = self.pathgrid.node(coords1[1], coords1[0])
-        end = self.pathgrid.node(coords2[1], coords2[0])
-        # The function returns two variables, but the second one is just
-        # ignored.
-        xy_path, runs = self.path_finder.find_path(start, end, self.pathgrid)
-        self.pathgrid.cleanup()
-        # Converts (x, y) coordinates of the path to (row, col) and returns.
-        rowcol_path = []
-        for coord in xy_path:
-            coord = coord[::-1]
-            rowcol_path.append(maze.get_tile(coord[0], coord[1]))
-        self.path = rowcol_path
-        self.next_tile = self.path[1]
-    
+        self.next_tile = starting_tile
+        world.enemy_group.add(self)
+        world.camera.add_to_layer(self, ACTORS_LAYER)
+
     # Calculates the direction to move in.
     def get_tile_direction(self, tile):
         if tile.rect.centerx > self.rect.centerx:
@@ -739,6 +942,9 @@ class Enemy(pygame.sprite.Sprite):
         elif tile.rect.centery < self.rect.centery:
             return "UP"
 
+    # Moves towards the next tile. Once its center is reached, the world is
+    # asked for the tile after that, one step along a shortest path to the
+    # player.
     def update(self, maze, player):
         if self.rect.center != self.next_tile.rect.center:
             direction = self.get_tile_direction(self.next_tile)
@@ -752,185 +958,504 @@ class Enemy(pygame.sprite.Sprite):
                 self.rect.move_ip(0, -self.speed)
         else:
             self.current_tile = self.next_tile
-            self.update_path(maze, self.current_tile, player.get_current_tile())
-            self.next_tile = self.path[1]
+            next_pos = self.world.get_chase_step(self.current_tile.get_pos(), player.get_current_tile(maze).get_pos())
+            if next_pos != None:
+                self.next_tile = maze.get_tile(*next_pos)
 
-## GAME CODE
-#Camera group initialized as it could not be initialized earlier in the code.
-CAMERA_GROUP = Camera()
-
-# Game elements initialized.
-game_elements = GameElements()
-
-# Clock object initialized. Needed to keep FPS stable during runtime.
-# Not to be confused with the timer.
-clock = pygame.time.Clock()
-
-# GAME LOOP
-# Flags to open and close the menus and start processes.
-running = True
-main_menu_open = True
-game_started = False
-game_running = False
-pause_menu_open = False
-end_status = None
-
-while running:
-    # MAIN MENU
-    # Left mouse button clicked status.
-    lmb = False
-    if main_menu_open:
-        # Event checker.
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                # Close the game if ESC is pressed.
-                if event.key == pygame.K_ESCAPE:
-                    running = False
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if pygame.mouse.get_pressed()[0]:
-                    lmb = True
-            if event.type == pygame.QUIT:
-                running = False
+# One game in progress: the maze, the player, the enemy, their sprite groups,
+# the timer and the score. Nothing in it reads the keyboard or needs a window,
+# so it can be stepped as fast as wanted without a display, and drawn only
+# when there is one. Nothing is shared between worlds, so any number of them
+# can exist at once, and a world is cleared up just by dropping it.
+class World():
+    def __init__(self, cells, loop_chance, item_chance, time, algorithm="backtracker", maze_seed=None, cache=None, prepared=None, build=True):
+        self.enemy_group = pygame.sprite.Group()
+        self.camera = Camera()
+        if maze_seed == None:
+            player_cell, enemy_cell = self.create_maze(cells, loop_chance, item_chance, algorithm)
+        else:
+            player_cell, enemy_cell = self.create_seeded_maze(cells, loop_chance, item_chance, algorithm, maze_seed, cache, prepared)
+        self.player = Player(player_cell, self)
 
-        display_surface.fill(BLACK)
-        # Difficulty options selection.
-        menu_status = game_elements.main_menu(lmb)
-        if menu_status == "EASY":
-            cells = 15
-            loop_chance = 0.1
-            item_chance = 0.5
-            time = 60
-            map_size = 8
-            game_started = True
-            main_menu_open = False
-        if menu_status == "MEDIUM":
-            cells = 27
-            loop_chance = 0.08
-            item_chance = 0.25
-            time = 120
-            map_size = 5
-            game_started = True
-            main_menu_open = False
-        if menu_status == "HARD":
-            cells = 45
-            loop_chance = 0.05
-            item_chance = 0.20
-            time = 180
-            map_size = 3
-            game_started = True
-            main_menu_open = False
-        if menu_status == "EXIT":
-            running = False
-
-    # GAME INITIALIZATION
-    if game_started:
-        # Clears out any existing objects.
-        for sprite in CAMERA_GROUP:
-            sprite.kill()
-            del sprite
+        # What the enemy chases the player with has to know when walls are
+        # broken. A TreeDistance takes a while to build, so given build=False
+        # it is left to build_steps(), which has to be run to the end before
+        # the world is stepped.
+        self.chase_field = None
+        self.tree_distance = None
+        if self.uses_tree_distance():
+            self.tree_distance = TreeDistance(self.maze.model, build)
+            self.maze.add_listener(self.tree_distance.tile_changed)
+        else:
+            self.chase_field = DistanceField(self.maze.model)
+            self.maze.add_listener(self.chase_field.tile_changed)
+        self.enemy = Enemy(enemy_cell, self)
+
+        # The timer counts ticks rather than real time, so it keeps up with
+        # the world however fast it is stepped.
+        self.ticks = 0
+        self.time = time
+        self.score = time*5
+
+    # Makes the maze, its items and its exit, and returns the cells the player
+    # and the enemy start on. Random numbers come from rng, a random.Random,
+    # if one is given, and from the random module if not.
+    def create_maze(self, cells, loop_chance, item_chance, algorithm, rng=None):
         # The grid object is initialized, and then the maze algorithm is invoked on a
         # random cell.
-        maze1 = Grid(cells, cells)
-        maze1.recursive_backtracker(maze1.get_random_cell(), loop_chance)
-        maze1.update_tile_pos()
-        maze1.generate_items(item_chance)
-        exit_wall = maze1.get_exit_wall()
-        exit_wall.make_exit()
-
-        # Player object is initialized and positioned on a random cell in the maze.
-        random_cell = maze1.get_random_cell()
-        p1 = Player(random_cell)
-
-        # Enemy is initialized and placed on a cell in front of the exit.
-        starting_cell = maze1.get_cell_near_exit(exit_wall)
-        enemy = Enemy(starting_cell)
-        enemy.update_pathgrid(maze1)
-        enemy.update_path(maze1, enemy.current_tile, p1.get_current_tile())
-    
-        # Timer started.
-        game_elements.start_timer(time)
+        self.maze = Grid(cells, cells)
+        self.maze.generate(algorithm, self.maze.get_random_cell(rng), loop_chance, rng)
+        self.maze.generate_items(item_chance, rng=rng)
+        self.exit_wall = self.maze.get_exit_wall(rng)
+        self.maze.make_exit(self.exit_wall)
+        # The player starts on a random cell in the maze, and the enemy on the
+        # cell in front of the exit.
+        return self.maze.get_random_cell(rng), self.maze.get_cell_near_exit(self.exit_wall)
 
-        # Flags changed.
-        game_started = False
-        game_running = True
+    # Same as create_maze(), with the maze only depending on its seed. Given a
+    # MazeCache, the maze is loaded from it if it was made before, and saved
+    # to it if not. A maze already made from the seed, such as one from a
+    # MazePool, can be given as prepared, a (model, exit_pos, items). The
+    # maze has a random.Random of its own, made from its seed, so the random
+    # module is left alone and worlds can be made on several threads at once.
+    # Where the player starts comes from play_rng(), so it is the same
+    # whichever way the maze was made.
+    def create_seeded_maze(self, cells, loop_chance, item_chance, algorithm, maze_seed, cache, prepared=None):
+        saved = prepared
+        if saved == None and cache != None:
+            saved = cache.load(maze_seed, cells, cells, algorithm, loop_chance, item_chance)
+        if saved != None:
+            model, exit_pos, items = saved[:3]
+            self.maze = Grid(cells, cells, model)
+            for row, col, item_type in items:
+                self.maze.add_item(row, col, item_type)
+            self.exit_wall = self.maze.get_tile(*exit_pos)
+            self.maze.make_exit(self.exit_wall)
+        else:
+            self.create_maze(cells, loop_chance, item_chance, algorithm, Random(maze_seed))
+            if cache != None:
+                items = [(item.row, item.col, item.type) for item in self.maze.items.values()]
+                cache.save(self.maze.model, self.exit_wall.get_pos(), items, maze_seed, algorithm, loop_chance, item_chance)
+        return self.maze.get_random_cell(play_rng(maze_seed)), self.maze.get_cell_near_exit(self.exit_wall)
 
-    # GAME PROCESS
-    if game_running:
-        item_used = None
-        # Event handler.
-        for event in pygame.event.get():
-            # Checks the keypresses.
-            if event.type == pygame.KEYDOWN:
-                # If pressed escape, pause the game.
-                if event.key == pygame.K_ESCAPE:
-                    pause_menu_open = True
-                    game_running = False
-                # Sends a signal that an item is used.
-                if event.key == pygame.K_z:
-                    item_used = "BREAK"
-                elif event.key == pygame.K_x:
-                    item_used = "JUMP"
-            # Updates the timer and subtracts score.
-            if event.type == TIMER_EVENT:
-                game_elements.second_passed()
-                if game_elements.time % 10 == 0:
-                    game_elements.add_to_score(-50)
-            # If the window is closed, the game is quit.
-            if event.type == pygame.QUIT:
-                running = False    
-
-        # Blit the game and HUD.
-        display_surface.fill(BLACK)
-        CAMERA_GROUP.draw(display_surface, p1)
-        maze1_map = maze1.draw_map(p1, enemy, map_size)
-        game_elements.draw_hud(maze1_map, p1)
-
-        # Update the player and enemy.
-        player_status = p1.update(item_used, maze1, game_elements)
-        enemy.update(maze1, p1)
-        if item_used == "BREAK":
-            enemy.update_pathgrid(maze1)
-        
-        # Quits the game to main menu upon these conditions.
-        if player_status == "EXIT":
-            game_running = False
-            main_menu_open = True
-        elif player_status == "ENEMY":
-            game_running = False
-            main_menu_open = True
-        if game_elements.time == 0:
-            game_running = False
-            main_menu_open = True
-
-    # PAUSE MENU
-    if pause_menu_open:
+    def add_to_score(self, amount):
+        self.score += amount
+
+    def second_passed(self):
+        self.time -= 1
+
+    # Returns as string with seconds converted to minutes and seconds.
+    def get_time_str(self):
+        minutes = self.time // 60
+        seconds = self.time % 60
+        if seconds < 10:
+            seconds = "0" + str(seconds)
+        else:
+            seconds = str(seconds)
+        if minutes < 10:
+            minutes = "0" + str(minutes)
+        else:
+            minutes = str(minutes)
+        return minutes + ":" + seconds
+
+    # Does the enemy chase with a TreeDistance, which it does if the maze has
+    # few enough loops, for its size: passages between cells past the ones a
+    # maze with no loops would have.
+    def uses_tree_distance(self):
+        tiles = self.maze.model.tiles
+        cells = (self.maze.MAX_VER_TILES//2)*(self.maze.MAX_HOR_TILES//2)
+        loops = tiles.count(PASSAGE) - cells + 1
+        return loops <= TREE_DISTANCE_MAX_LOOPS and loops*len(tiles) <= TREE_DISTANCE_MAX_ENTRIES
+
+    # Same as building the world with build=True, a step at a time, for a
+    # world made with build=False. What is built is handed to watch, if
+    # given, first.
+    def build_steps(self, watch=None):
+        if self.tree_distance != None:
+            if watch != None:
+                watch(self.tree_distance)
+            yield from self.tree_distance.build_steps()
+
+    # Returns the (row, col) of the tile to move onto from start to get one
+    # step closer to goal, or None if there isn't one.
+    def get_chase_step(self, start, goal):
+        if self.tree_distance != None:
+            return self.tree_distance.next_step(start, goal)
+        self.chase_field.set_target(*goal)
+        return self.chase_field.next_step(*start)
+
+    # Advances the world by one tick. The inputs are the actions for this
+    # tick: any of "LEFT", "RIGHT", "UP" and "DOWN" that are held, and "BREAK"
+    # or "JUMP" if an item is used. Returns "EXIT" or "ENEMY" if the player
+    # touched one, "TIME" if the time ran out, or None if the game goes on.
+    def step(self, inputs):
+        player_status = self.player.update(inputs, self.maze, self)
+        self.enemy.update(self.maze, self.player)
+        # Updates the timer and subtracts score.
+        self.ticks += 1
+        if self.ticks % TICKS_PER_SECOND == 0:
+            self.second_passed()
+            if self.time % 10 == 0:
+                self.add_to_score(-50)
+        if player_status != None:
+            return player_status
+        if self.time == 0:
+            return "TIME"
+
+    # Blits the game and HUD.
+    def draw(self, display, game_elements, map_size):
+        display.fill(BLACK)
+        self.camera.draw(display, self.player, self.maze)
+        maze_map = self.maze.draw_map(self.player, self.enemy, map_size)
+        game_elements.draw_hud(maze_map, self)
+
+# The endless mode. The maze is made a few rows at a time as the player heads
+# down it, and only ENDLESS_WINDOW_CELL_ROWS rows are ever kept, so it takes
+# the same memory however far the player gets. The enemy, items and minimap
+# all work on the rows that are kept.
+class EndlessWorld(World):
+    def __init__(self, cells, loop_chance, item_chance, time):
+        self.item_chance = item_chance
+        super().__init__(cells, loop_chance, item_chance, time, "eller")
+        self.maze.rows_listeners.append(self.chase_field.rows_removed)
+
+    # A TreeDistance can't follow rows being dropped, so the enemy always
+    # chases with a DistanceField here.
+    def uses_tree_distance(self):
+        return False
+
+    # The player starts a few rows down, and the enemy on the top row. There
+    # is no exit.
+    def create_maze(self, cells, loop_chance, item_chance, algorithm):
+        self.maze = EndlessGrid(cells, ENDLESS_WINDOW_CELL_ROWS, loop_chance)
+        # The bottom row of cells doesn't know its walls below yet.
+        self.maze.generate_items(item_chance, range(1, self.maze.MAX_VER_TILES-2, 2))
+        self.exit_wall = None
+        player_cell = self.maze.get_tile(7, randrange(1, self.maze.MAX_HOR_TILES-1, 2))
+        enemy_cell = self.maze.get_tile(1, randrange(1, self.maze.MAX_HOR_TILES-1, 2))
+        return player_cell, enemy_cell
+
+    # Same as World.step(), and moves the window down once the player is past
+    # its middle.
+    def step(self, inputs):
+        status = super().step(inputs)
+        if status == None and self.player.rect.centery//TILE_PIXELS > self.maze.MAX_VER_TILES//2:
+            self.advance()
+        return status
+
+    def advance(self):
+        self.maze.advance(ENDLESS_ADVANCE_CELL_ROWS, self.item_chance)
+        moved = 2*ENDLESS_ADVANCE_CELL_ROWS*TILE_PIXELS
+        self.player.rect.move_ip(0, -moved)
+        self.enemy.rect.move_ip(0, -moved)
+        # The enemy's tiles move up with the grid, unless they were dropped
+        # or walled off at the top.
+        rows = 2*ENDLESS_ADVANCE_CELL_ROWS
+        if min(self.enemy.current_tile.row, self.enemy.next_tile.row) - rows < 2:
+            self.respawn_enemy()
+        else:
+            self.enemy.current_tile = self.maze.get_tile(self.enemy.current_tile.row-rows, self.enemy.current_tile.col)
+            self.enemy.next_tile = self.maze.get_tile(self.enemy.next_tile.row-rows, self.enemy.next_tile.col)
+
+    # Returns the highest cell that can reach the player and isn't too close
+    # to them. Cells in the window can be cut off from each other, joined only
+    # through rows that are gone or not made yet.
+    def get_respawn_cell(self):
+        self.chase_field.set_target(*self.maze.pixel_to_tile(self.player.rect.center))
+        for row in range(1, self.maze.MAX_VER_TILES, 2):
+            for col in range(1, self.maze.MAX_HOR_TILES, 2):
+                distance = self.chase_field.get_distance(row, col)
+                if distance != None and distance >= ENEMY_RESPAWN_DISTANCE:
+                    return self.maze.get_tile(row, col)
+        return self.maze.get_tile(1, 1)
+
+    def respawn_enemy(self):
+        tile = self.get_respawn_cell()
+        self.enemy.rect.center = tile.rect.center
+        self.enemy.current_tile = tile
+        self.enemy.next_tile = tile
+
+# Makes a world while the loading screen is shown. make_world is called with
+# the loader, and returns a Python generator that yields after every step of
+# making the world and returns the world. Whatever makes the maze hands its
+# MazeModel to watch() before carving it, and the progress is worked out from
+# how many walls have been carved in it so far. Anything built after that,
+# such as a TreeDistance, is handed to watch_build(), and the progress starts
+# again from how far through building it is, the same as it does for each
+# maze carved.
+# The steps are run on a thread of its own, so the window keeps being drawn
+# and reading events, or, if threaded is False, step() runs some of them
+# each frame. Cancelling stops it at the next step, and a world that was
+# cancelled is never handed over. Seeded mazes don't use the random module,
+# so a new loader can start while a cancelled one is still stopping.
+class WorldLoader():
+    def __init__(self, make_world, threaded=True):
+        self.model = None
+        self.building = None
+        self.world = None
+        self.error = None
+        self.done = False
+        self.cancelled = Event()
+        self.steps = self.build(make_world)
+        self.thread = None
+        if threaded:
+            # The thread doesn't keep the game open if it's closed while
+            # loading.
+            self.thread = Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def build(self, make_world):
+        world = yield from make_world(self)
+        if not self.is_cancelled():
+            self.world = world
+
+    def run(self):
+        try:
+            for step in self.steps:
+                if self.is_cancelled():
+                    break
+        except Exception as error:
+            self.error = error
+        self.done = True
+
+    # Runs steps for up to seconds, when the loader isn't threaded.
+    def step(self, seconds):
+        if self.done or self.is_cancelled():
+            return
+        try:
+            self.done = run_for(self.steps, seconds)
+        except Exception as error:
+            self.error = error
+            self.done = True
+
+    def watch(self, model):
+        self.model = model
+        self.building = None
+
+    def watch_build(self, building):
+        self.building = building
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_cancelled(self):
+        return self.cancelled.is_set()
+
+    def is_done(self):
+        return self.done
+
+    # Returns the world once it's made, and raises whatever stopped it being
+    # made.
+    def get_world(self):
+        if self.error != None:
+            raise self.error
+        return self.world
+
+    # Returns how far through carving the maze, or building what was built
+    # after it, is, from 0 to 1. A maze with every cell joined has one passage
+    # fewer than it has cells, and walls being carved never have flags, so
+    # passages can be counted as bytes.
+    def get_progress(self):
+        if self.done:
+            return 1
+        if self.building != None:
+            return self.building.get_build_progress()
+        model = self.model
+        if model == None:
+            return 0
+        cells = (model.MAX_VER_TILES//2)*(model.MAX_HOR_TILES//2)
+        return min(1, model.tiles.count(PASSAGE)/max(1, cells-1))
+
+## GAME CODE
+# Keys that are held to move, and the actions they give World.step().
+MOVE_KEYS = {pygame.K_LEFT: "LEFT",
+             pygame.K_RIGHT: "RIGHT",
+             pygame.K_UP: "UP",
+             pygame.K_DOWN: "DOWN"}
+
+def main():
+    # Creating the window.
+    display_surface = pygame.display.set_mode((MAX_WIDTH, MAX_HEIGHT))
+    pygame.display.set_caption("Game")
+    for item_type in TEXTURES:
+        TEXTURES[item_type] = TEXTURES[item_type].convert_alpha()
+
+    # Game elements initialized.
+    game_elements = GameElements(display_surface)
+
+    # Mazes for every preset start being made in the background straight
+    # away, so there is one ready by the time a difficulty is picked.
+    pool_presets = {name: (cells, loop_chance, item_chance, algorithm)
+                    for name, (cells, loop_chance, item_chance, time, map_size, algorithm) in PRESETS.items()}
+    maze_pool = MazePool(pool_presets, PRESET_TARGETS, POOL_SIZE)
+
+    # Clock object initialized. Needed to keep FPS stable during runtime.
+    # Not to be confused with the timer.
+    clock = pygame.time.Clock()
+
+    # GAME LOOP
+    # Flags to open and close the menus and start processes.
+    running = True
+    main_menu_open = True
+    game_started = False
+    loading_open = False
+    game_running = False
+    loader = None
+    pause_menu_open = False
+
+    while running:
+        # MAIN MENU
+        # Left mouse button clicked status.
         lmb = False
-        # Event handler.
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    pause_menu_open = False
-                    game_running = True
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if pygame.mouse.get_pressed()[0]:
-                    lmb = True
-            if event.type == pygame.QUIT:
+        if main_menu_open:
+            # Event checker.
+            for event in pygame.event.get():
+                if event.type == pygame.KEYDOWN:
+                    # Close the game if ESC is pressed.
+                    if event.key == pygame.K_ESCAPE:
+                        running = False
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    if pygame.mouse.get_pressed()[0]:
+                        lmb = True
+                if event.type == pygame.QUIT:
+                    running = False
+
+            display_surface.fill(BLACK)
+            # Difficulty options selection.
+            menu_status = game_elements.main_menu(lmb)
+            if menu_status in PRESETS:
+                cells, loop_chance, item_chance, time, map_size, algorithm = PRESETS[menu_status]
+                game_mode = menu_status
+                game_started = True
+                main_menu_open = False
+            elif menu_status == "ENDLESS":
+                cells, loop_chance, item_chance, time, map_size = ENDLESS_PRESET
+                game_mode = menu_status
+                game_started = True
+                main_menu_open = False
+            if menu_status == "EXIT":
                 running = False
-        
-        pause_status = game_elements.pause_menu(lmb)
-        if pause_status == "RESUME":
-            pause_menu_open = False
-            game_running = True
-        elif pause_status == "EXIT":
-            pause_menu_open = False
-            main_menu_open = True
-
-    # Update display.
-    pygame.display.update()
-
-    # Makes the game run at a set FPS.
-    clock.tick(60)
-
-# Successfuly closes the game and quits the process.
-pygame.quit()
-exit()
\ No newline at end of file
+
+        # GAME INITIALIZATION
+        # The world is made on another thread, and the loading screen is
+        # shown until it's ready.
+        if game_started:
+            if game_mode == "ENDLESS":
+                def make_world(loader, cells=cells, loop_chance=loop_chance, item_chance=item_chance, time=time):
+                    # The endless window is small enough to make in one step.
+                    yield
+                    return EndlessWorld(cells, loop_chance, item_chance, time)
+            else:
+                def make_world(loader, cells=cells, loop_chance=loop_chance, item_chance=item_chance, time=time,
+                               algorithm=algorithm, game_mode=game_mode):
+                    maze_seed, model, exit_pos, items = yield from maze_pool.take_steps(game_mode, loader.watch)
+                    yield
+                    world = World(cells, loop_chance, item_chance, time, algorithm, maze_seed, prepared=(model, exit_pos, items), build=False)
+                    yield from world.build_steps(loader.watch_build)
+                    return world
+            loader = WorldLoader(make_world, not LOAD_IN_FRAMES)
+
+            # Flags changed.
+            game_started = False
+            loading_open = True
+
+        # LOADING SCREEN
+        if loading_open:
+            lmb = False
+            cancelled = False
+            # Event handler.
+            for event in pygame.event.get():
+                if event.type == pygame.KEYDOWN:
+                    # Going back to the menu drops the world being made.
+                    if event.key == pygame.K_ESCAPE:
+                        cancelled = True
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    if pygame.mouse.get_pressed()[0]:
+                        lmb = True
+                if event.type == pygame.QUIT:
+                    running = False
+
+            if LOAD_IN_FRAMES:
+                loader.step(LOAD_FRAME_SECONDS)
+            display_surface.fill(BLACK)
+            if game_elements.loading_screen(lmb, loader.get_progress(), loader.model if SHOW_CARVING else None) == "CANCEL":
+                cancelled = True
+            if cancelled:
+                loader.cancel()
+                loading_open = False
+                main_menu_open = True
+            elif loader.is_done():
+                world = loader.get_world()
+                loading_open = False
+                game_running = True
+
+        # GAME PROCESS
+        if game_running:
+            item_used = None
+            # Event handler.
+            for event in pygame.event.get():
+                # Checks the keypresses.
+                if event.type == pygame.KEYDOWN:
+                    # If pressed escape, pause the game.
+                    if event.key == pygame.K_ESCAPE:
+                        pause_menu_open = True
+                        game_running = False
+                    # Sends a signal that an item is used.
+                    if event.key == pygame.K_z:
+                        item_used = "BREAK"
+                    elif event.key == pygame.K_x:
+                        item_used = "JUMP"
+                # If the window is closed, the game is quit.
+                if event.type == pygame.QUIT:
+                    running = False
+
+            # The keyboard is turned into the actions the world understands.
+            pressed_keys = pygame.key.get_pressed()
+            inputs = [action for key, action in MOVE_KEYS.items() if pressed_keys[key]]
+            if item_used != None:
+                inputs.append(item_used)
+
+            world.draw(display_surface, game_elements, map_size)
+
+            # Quits the game to main menu when the player reaches the exit, is
+            # caught, or runs out of time.
+            if world.step(inputs) != None:
+                game_running = False
+                main_menu_open = True
+
+        # PAUSE MENU
+        if pause_menu_open:
+            lmb = False
+            # Event handler.
+            for event in pygame.event.get():
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        pause_menu_open = False
+                        game_running = True
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    if pygame.mouse.get_pressed()[0]:
+                        lmb = True
+                if event.type == pygame.QUIT:
+                    running = False
+
+            pause_status = game_elements.pause_menu(lmb)
+            if pause_status == "RESUME":
+                pause_menu_open = False
+                game_running = True
+            elif pause_status == "EXIT":
+                pause_menu_open = False
+                main_menu_open = True
+
+        # Update display.
+        pygame.display.update()
+
+        # Makes the game run at a set FPS.
+        clock.tick(TICKS_PER_SECOND)
+
+    # Successfuly closes the game and quits the process.
+    maze_pool.close()
+    pygame.quit()
+    exit()
+
+if __name__ == "__main__":
+    main()
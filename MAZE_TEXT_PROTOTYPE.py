@@ -1,4 +1,6 @@
-from random import choice, random
+import sys
+from maze_model import MazeModel, CELL, PASSAGE
+from maze_chunks import ChunkedMaze
 
 #Basic class that acts as a coordinate on a map.
 #Only needed for other classes to inherit from.
@@ -19,18 +21,14 @@ class Wall(Tile):
 
 #A tile that can be walked through. It acts as the nodes of a graph.
 class Cell(Tile):
-    def __init__(self, row, col):
+    def __init__(self, row, col, visited=False):
         super().__init__(row, col)
         self.type = "CELL"
-        self.visited = False
+        self.visited = visited
 
     #Return a boolean.
     def IsVisited(self):
         return self.visited
-    
-    #Change the visited status.
-    def Visit(self):
-        self.visited = True
 
 #The passage class is used to indiciate a connection between cells.
 #Can be walked through.
@@ -42,84 +40,94 @@ class Passage(Tile):
         self.type = "PASSAGE"
 
 #The grid class is basically a two dimensional array with special methods.
-#Each space will hold either a wall, a cell, or a passage.
+#The tiles are stored one byte each in a MazeModel, which is shared with the
+#game, and tile objects are only made when one is asked for.
 class Grid():
     def __init__(self, vertical_cells, horizontal_cells):
-        self.MAX_ROW = vertical_cells*2+1
-        self.MAX_COL = horizontal_cells*2+1
-        #Initialize a blank grid of walls and cells.
-        self.grid = [[self.__GenerateCellorWall(row, col) for col in range(0, self.MAX_COL)] for row in range(0, self.MAX_ROW)]
-    
-    #Method used in the init of the grid.
-    def __GenerateCellorWall(self, row, col):
-        if row % 2 != 0 and col % 2 != 0:
-            return Cell(row, col)
-        else:
-            return Wall(row, col)
+        self.model = MazeModel(vertical_cells, horizontal_cells)
+        self.MAX_ROW = self.model.MAX_VER_TILES
+        self.MAX_COL = self.model.MAX_HOR_TILES
     
     #Displays the maze in a textual form.
     def DisplayMaze(self):
-        for row in self.grid:
-            print()
-            for tile in row:
-                if tile.type == "WALL":
-                    print('H ', end='')
-                else:
-                    print('  ', end='')
+        self.model.print_grid()
     
     #Return the tile on that row and column.
     def Tile(self, row, col):
-        return self.grid[row][col]
-    
-    #Returns a list of adjacent unvisited neighbours of a cell.
-    def GetUnvisitedNeighbours(self, cell):
-        unvisited_neighbours = []
-        row, col = cell.GetPos()
-        N = -2
-        E = 2
-        S = 2
-        W = -2
-        try:
-            if not self.Tile(row+N, col).IsVisited():
-                unvisited_neighbours.append(self.Tile(row+N, col))
-        except:
-            pass
-        try:
-            if not self.Tile(row, col+E).IsVisited():
-                unvisited_neighbours.append(self.Tile(row, col+E))
-        except:
-            pass
-        try:
-            if not self.Tile(row+S, col).IsVisited():
-                unvisited_neighbours.append(self.Tile(row+S, col))
-        except:
-            pass
-        try:
-            if not self.Tile(row, col+W).IsVisited():
-                unvisited_neighbours.append(self.Tile(row, col+W))
-        except:
-            pass
-        return unvisited_neighbours
+        tile_type = self.model.get_type(row, col)
+        if tile_type == CELL:
+            return Cell(row, col, self.model.is_visited(row, col))
+        elif tile_type == PASSAGE:
+            return Passage(row, col)
+        else:
+            return Wall(row, col)
     
     #Changes the wall between two cells to a passage.
     def CarvePassage(self, cell1, cell2):
-        row = (cell1.row + cell2.row) // 2
-        col = (cell1.col + cell2.col) // 2
-        self.grid[row][col] = Passage(row, col)
+        self.model.carve_passage(cell1.row, cell1.col, cell2.row, cell2.col)
     
-    #Recursive backtracker algorithm.
+    #Recursive backtracker algorithm, done by the model.
     def RecursiveBacktracker(self, cell, loop_chance):
-        neighbours = self.GetUnvisitedNeighbours(cell)
-        cell.Visit()
-        while len(neighbours) != 0:
-            next_cell = choice(neighbours)
-            neighbours.remove(next_cell)
-            if not next_cell.IsVisited(): 
-                self.CarvePassage(cell, next_cell)
-            elif random() < loop_chance:
-                self.CarvePassage(cell, next_cell)
-            self.RecursiveBacktracker(next_cell, loop_chance)
+        self.model.recursive_backtracker(cell.row, cell.col, loop_chance)
+
+    #Same as RecursiveBacktracker, a step at a time. Each passage is
+    #returned as soon as it is carved, so the maze can be shown part way.
+    def RecursiveBacktrackerSteps(self, cell, loop_chance):
+        for wall in self.model.backtracker_steps(cell.row, cell.col, loop_chance):
+            yield self.Tile(*divmod(wall, self.MAX_COL))
+
+#Carves a maze, displaying it every few steps while it is made.
+def StreamMaze(maze, cell, loop_chance, steps_per_frame):
+    for step, passage in enumerate(maze.RecursiveBacktrackerSteps(cell, loop_chance)):
+        if step % steps_per_frame == 0:
+            maze.DisplayMaze()
+            print()
+    maze.DisplayMaze()
+
+#Walks around a world with no edges, made a chunk at a time from world_seed.
+#The view follows the player, and every move tells the world where the player
+#is, so the chunks around them are made before they come into view and the
+#ones left far behind are dropped. Moves are typed as any number of w, a, s
+#and d, and q quits.
+def ExploreWorld(world_seed, view_rows, view_cols):
+    world = ChunkedMaze(world_seed)
+    moves = {"w": (-1, 0), "a": (0, -1), "s": (1, 0), "d": (0, 1)}
+    row, col = 1, 1
+    try:
+        while True:
+            world.update(row, col)
+            for view_row in range(row - view_rows//2, row + view_rows//2 + 1):
+                line = ""
+                for view_col in range(col - view_cols//2, col + view_cols//2 + 1):
+                    if (view_row, view_col) == (row, col):
+                        line += "P "
+                    elif world.is_wall(view_row, view_col):
+                        line += "H "
+                    else:
+                        line += "  "
+                print(line)
+            command = input("(%d, %d) move with w/a/s/d, q to quit: " % (row, col))
+            if command == "q":
+                break
+            for key in command:
+                if key in moves:
+                    step_row, step_col = moves[key]
+                    if not world.is_wall(row + step_row, col + step_col):
+                        row += step_row
+                        col += step_col
+    except EOFError:
+        pass
+    finally:
+        world.close()
 
-maze1 = Grid(12, 12)
-maze1.RecursiveBacktracker(maze1.Tile(1, 1), 0.1)
-maze1.DisplayMaze()
\ No newline at end of file
+if __name__ == "__main__":
+    maze1 = Grid(12, 12)
+    #Run with --stream to watch the maze being carved, or with --world and a
+    #number to walk around the world made from that seed.
+    if "--stream" in sys.argv:
+        StreamMaze(maze1, maze1.Tile(1, 1), 0.1, 20)
+    elif "--world" in sys.argv:
+        ExploreWorld(int(sys.argv[sys.argv.index("--world") + 1]), 21, 41)
+    else:
+        maze1.RecursiveBacktracker(maze1.Tile(1, 1), 0.1)
+        maze1.DisplayMaze()
@@ -0,0 +1,299 @@
+import os
+# Games are played without a window.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import argparse
+import csv
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from time import perf_counter
+from MAZE_PYGAME_PROTOTYPE import World, PRESETS, TICKS_PER_SECOND, TILE_PIXELS
+from junction_graph import JunctionGraph
+from navigation import DistanceField
+from maze_generators import GENERATORS
+from maze_file import MazeCache
+try:
+    import numpy as np
+except ImportError:
+    # Without NumPy, results are written as CSV files instead.
+    np = None
+
+POLICIES = ("shortest", "greedy", "random")
+
+# The item-greedy bot only uses an item when it saves at least this many
+# steps.
+MIN_SHORTCUT = 6
+
+# Seconds the item-greedy bot keeps spare for getting to the exit.
+SPARE_SECONDS = 2
+
+# Columns written for every game, in order, with their types.
+COLUMNS = (("preset", str), ("policy", str), ("seed", int), ("result", str), ("ticks", int), ("seconds", float),
+           ("score", int), ("items_collected", int), ("items_used", int))
+
+## CLASSES
+# Plays one World by turning a policy into the same actions a person's keys
+# would give World.step():
+# - "shortest" walks the shortest path to the exit and never uses items.
+# - "greedy" picks up the nearest item that still leaves time to reach the
+#   exit, until there are none left, then heads for the exit. It uses items
+#   to jump or break through walls that are in the way.
+# - "random" wanders, picking a random way on at every tile and only turning
+#   back at dead ends.
+# None of them look out for the enemy.
+class Bot():
+    def __init__(self, world, policy, rng):
+        self.world = world
+        self.maze = world.maze
+        self.model = world.maze.model
+        self.policy = policy
+        self.rng = rng
+        # Paths come from the junction graph, which has to know about broken
+        # walls.
+        self.graph = JunctionGraph(self.model)
+        self.maze.add_listener(self.graph.tile_changed)
+        self.exit_tile = world.exit_wall.get_pos()
+        self.exit_approach = self.model.get_cell_near_exit(*self.exit_tile)
+        # How far every tile is from the exit.
+        self.exit_field = DistanceField(self.model)
+        self.exit_field.set_target(*self.exit_approach)
+        self.maze.add_listener(self.exit_field.tile_changed)
+        # Tiles still to walk to, in order.
+        self.route = []
+        # The item being used to get to the end of the route, if any.
+        self.item = None
+        self.previous_tile = None
+
+    def get_tile_center(self, tile):
+        return tile[1]*TILE_PIXELS + TILE_PIXELS//2, tile[0]*TILE_PIXELS + TILE_PIXELS//2
+
+    # The player moves a fixed distance each tick, so it only has to get
+    # within one move of a point.
+    def is_near(self, pos, point):
+        speed = self.world.player.speed
+        return abs(pos[0]-point[0]) < speed and abs(pos[1]-point[1]) < speed
+
+    # Returns the actions for the next tick.
+    def get_inputs(self):
+        center = self.world.player.rect.center
+        tile = self.maze.pixel_to_tile(center)
+        # Drops every tile of the route that has been reached.
+        while len(self.route) != 0 and self.is_near(center, self.get_tile_center(self.route[0])):
+            self.previous_tile = self.route.pop(0)
+            if len(self.route) == 0:
+                self.item = None
+        if len(self.route) == 0:
+            self.plan(tile)
+            if len(self.route) == 0:
+                return []
+        inputs = self.steer(center, tile, self.route[0])
+        if self.item != None:
+            inputs.append(self.item)
+        return inputs
+
+    # Moves towards a tile in the same row or column. The player is lined up
+    # with the middle of its tile first, so it fits through the gap.
+    def steer(self, center, tile, target):
+        speed = self.world.player.speed
+        center_x, center_y = center
+        target_x, target_y = self.get_tile_center(target)
+        tile_x, tile_y = self.get_tile_center(tile)
+        inputs = []
+        if target[0] == tile[0] and target[1] != tile[1]:
+            if abs(center_y-tile_y) >= speed:
+                inputs.append("DOWN" if tile_y > center_y else "UP")
+            else:
+                inputs.append("RIGHT" if target_x > center_x else "LEFT")
+        elif target[1] == tile[1] and target[0] != tile[0]:
+            if abs(center_x-tile_x) >= speed:
+                inputs.append("RIGHT" if tile_x > center_x else "LEFT")
+            else:
+                inputs.append("DOWN" if target_y > center_y else "UP")
+        else:
+            if abs(center_x-target_x) >= speed:
+                inputs.append("RIGHT" if target_x > center_x else "LEFT")
+            if abs(center_y-target_y) >= speed:
+                inputs.append("DOWN" if target_y > center_y else "UP")
+        return inputs
+
+    # Works out the route from the tile the player is on.
+    def plan(self, tile):
+        if self.policy == "shortest":
+            self.route = self.get_exit_route(tile)
+        elif self.policy == "greedy":
+            self.plan_greedy(tile)
+        else:
+            self.plan_random(tile)
+
+    # The shortest path to the tile in front of the exit, and then the exit.
+    def get_exit_route(self, tile):
+        return self.graph.get_path(tile, self.exit_approach)[1:] + [self.exit_tile]
+
+    # Goes one tile at a time, so a shortcut can be taken from any tile.
+    def plan_greedy(self, tile):
+        goal = None
+        ticks_per_tile = TILE_PIXELS//self.world.player.speed
+        ticks_left = (self.world.time-SPARE_SECONDS)*TICKS_PER_SECOND
+        nearest = None
+        for pos in self.maze.items:
+            distance = self.graph.get_distance(tile, pos)
+            if (distance + self.exit_field.get_distance(*pos))*ticks_per_tile < ticks_left and (nearest == None or distance < nearest):
+                goal = pos
+                nearest = distance
+        if goal != None:
+            if not self.try_shortcut(tile, goal):
+                self.route = self.graph.get_path(tile, goal)[1:2]
+        elif not self.try_shortcut(tile, self.exit_approach):
+            self.route = self.get_exit_route(tile)[:1]
+
+    # Looks for a wall next to the tile with an open tile behind it that is
+    # much closer to the goal, and goes through it if an item is left.
+    def try_shortcut(self, tile, goal):
+        player = self.world.player
+        if player.item_jump == 0 and player.item_break == 0:
+            return False
+        distance = self.graph.get_distance(tile, goal)
+        best = None
+        for row_step, col_step in ((-1, 0), (0, 1), (1, 0), (0, -1)):
+            wall = (tile[0]+row_step, tile[1]+col_step)
+            behind = (tile[0]+2*row_step, tile[1]+2*col_step)
+            if not self.model.in_bounds(*behind) or not self.model.is_wall(*wall) or self.model.is_special(*wall) or self.model.is_wall(*behind):
+                continue
+            saved = distance - (self.graph.get_distance(behind, goal) + 2)
+            if saved >= MIN_SHORTCUT and (best == None or saved > best[0]):
+                best = (saved, wall, behind)
+        if best == None:
+            return False
+        saved, wall, behind = best
+        # Jumping leaves the maze as it was, so it is used first.
+        if player.item_jump != 0:
+            self.item = "JUMP"
+            self.route = [behind]
+        else:
+            self.item = "BREAK"
+            self.route = [wall, behind]
+        return True
+
+    def plan_random(self, tile):
+        options = []
+        for row_step, col_step in ((-1, 0), (0, 1), (1, 0), (0, -1)):
+            neighbour = (tile[0]+row_step, tile[1]+col_step)
+            if not self.model.is_wall(*neighbour) and neighbour != self.previous_tile:
+                options.append(neighbour)
+        if len(options) == 0 and self.previous_tile != None:
+            options.append(self.previous_tile)
+        if len(options) != 0:
+            self.route = [self.rng.choice(options)]
+
+## FUNCTIONS
+# Plays one game to the end and returns a row of the results, in the same
+# order as COLUMNS. The maze only depends on the seed, so every policy can be
+# given the same mazes, and with a cache directory each maze is only made
+# once.
+def play_game(task):
+    preset, cells, loop_chance, item_chance, time, algorithm, policy, game_seed, cache_directory = task
+    cache = None
+    if cache_directory != None:
+        cache = MazeCache(cache_directory)
+    world = World(cells, loop_chance, item_chance, time, algorithm, game_seed, cache)
+    items_at_start = len(world.maze.items)
+    held_at_start = world.player.item_break + world.player.item_jump
+    bot = Bot(world, policy, Random(game_seed))
+    result = None
+    while result == None:
+        result = world.step(bot.get_inputs())
+    collected = items_at_start - len(world.maze.items)
+    used = held_at_start + collected - world.player.item_break - world.player.item_jump
+    return (preset, policy, game_seed, result, world.ticks, world.ticks/TICKS_PER_SECOND, world.score, collected, used)
+
+# Runs every task across a pool of processes. Each game is independent, so
+# the games are just split between the workers. Workers past the number of
+# cores only add the cost of the processes, which is why there is one per
+# core unless asked otherwise.
+def play_games(tasks, workers):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunk_size = max(1, len(tasks)//(workers*8))
+        return list(executor.map(play_game, tasks, chunksize=chunk_size))
+
+# Results are stored a column at a time, as a typed array per measure in one
+# NumPy .npz file, so each measure can be loaded on its own, without going
+# through every game or parsing any text. Without NumPy, each column is a CSV
+# file of its own in a directory named path instead. Entry n of every column
+# is the same game. Returns where the results were written.
+def write_columns(rows, path):
+    if np != None:
+        if not path.endswith(".npz"):
+            path += ".npz"
+        np.savez(path, **{name: np.array([row[index] for row in rows], dtype=column_type)
+                          for index, (name, column_type) in enumerate(COLUMNS)})
+        return path
+    os.makedirs(path, exist_ok=True)
+    for index, (name, column_type) in enumerate(COLUMNS):
+        with open(os.path.join(path, name + ".csv"), "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow([name])
+            writer.writerows([row[index]] for row in rows)
+    return path
+
+def print_summary(rows):
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(row[0], row[1])].append(row)
+    print("preset  policy    games  win%   caught%  timeout%  exit time  score    collected  used")
+    for (preset, policy), games in groups.items():
+        wins = [row for row in games if row[3] == "EXIT"]
+        caught = [row for row in games if row[3] == "ENEMY"]
+        timeouts = [row for row in games if row[3] == "TIME"]
+        exit_time = "%.1f s" % (sum(row[5] for row in wins)/len(wins)) if len(wins) != 0 else "-"
+        print("%-7s %-9s %-6d %-6.1f %-8.1f %-9.1f %-10s %-8.1f %-10.2f %.2f" % (preset, policy, len(games),
+              100*len(wins)/len(games), 100*len(caught)/len(games), 100*len(timeouts)/len(games), exit_time,
+              sum(row[6] for row in games)/len(games),
+              sum(row[7] for row in games)/len(games),
+              sum(row[8] for row in games)/len(games)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays headless games with scripted bots to compare the difficulty presets.")
+    parser.add_argument("--games", type=int, default=20, help="games per preset and policy")
+    parser.add_argument("--presets", nargs="+", default=list(PRESETS), choices=list(PRESETS))
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES), choices=POLICIES)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--out", default="bot_results", help="where the columns of results are written: a .npz file, or a directory of CSV files without NumPy")
+    parser.add_argument("--cache", help="directory where mazes are saved and loaded again")
+    # Any of these replace the value from every chosen preset, for trying out
+    # new settings.
+    parser.add_argument("--cells", type=int)
+    parser.add_argument("--loop-chance", type=float)
+    parser.add_argument("--item-chance", type=float)
+    parser.add_argument("--time", type=int)
+    parser.add_argument("--algorithm", choices=list(GENERATORS))
+    args = parser.parse_args()
+
+    tasks = []
+    for preset in args.presets:
+        cells, loop_chance, item_chance, time, map_size, algorithm = PRESETS[preset]
+        if args.cells != None:
+            cells = args.cells
+        if args.loop_chance != None:
+            loop_chance = args.loop_chance
+        if args.item_chance != None:
+            item_chance = args.item_chance
+        if args.time != None:
+            time = args.time
+        if args.algorithm != None:
+            algorithm = args.algorithm
+        for policy in args.policies:
+            for game in range(args.games):
+                tasks.append((preset, cells, loop_chance, item_chance, time, algorithm, policy, args.seed+game, args.cache))
+
+    start_time = perf_counter()
+    rows = play_games(tasks, args.workers)
+    elapsed = perf_counter()-start_time
+    out = write_columns(rows, args.out)
+    print_summary(rows)
+    print("%d games in %.1f s on %d workers (%.1f games/s), written to %s" % (len(rows), elapsed, args.workers, len(rows)/elapsed, out))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import os
+import sys
+from collections import deque
+from random import Random
+from tempfile import TemporaryDirectory
+from maze_model import MazeModel, TYPE_MASK, EXIT, PAINTED, PASSAGE, WALL
+from maze_generators import generate
+from maze_file import save_maze, load_maze
+from navigation import DistanceField
+from pathfinder import PathFinder
+from junction_graph import JunctionGraph
+from tree_distance import TreeDistance
+
+# Checks every way of finding distances and paths against a plain breadth
+# first search, on random mazes that have walls broken, closed and painted
+# between the questions, and checks that mazes come back from a maze file
+# the same as they went in. Run it after changing any of them. It prints one
+# line per check and exits with 1 if anything was wrong.
+
+# Mazes tried by each check, and questions asked between changes.
+MAZES = 40
+QUERIES = 30
+# Changes made to every maze, with questions asked after each one.
+CHANGES = 8
+
+## FUNCTIONS
+# Distance from a tile to every tile it can reach, by index.
+def plain_bfs(model, source):
+    distances = {source: 0}
+    queue = deque([source])
+    while len(queue) != 0:
+        current = queue.popleft()
+        for step in model.steps:
+            neighbour = current + step
+            if 0 <= neighbour < len(model.tiles) and neighbour not in distances and model.is_open(neighbour):
+                distances[neighbour] = distances[current] + 1
+                queue.append(neighbour)
+    return distances
+
+# A random maze of a random size, sometimes with loops.
+def random_maze(rng):
+    cells = rng.choice([3, 5, 9, 15, 27])
+    model = MazeModel(cells, cells)
+    generate(model, rng.choice(["backtracker", "kruskal", "eller"]), *model.get_random_cell(rng), rng.choice([0, 0.05, 0.3]), rng)
+    return model
+
+# Breaks or closes a random tile that isn't special, or paints it. Returns
+# its row and column.
+def change_tile(model, rng):
+    row = rng.randrange(1, model.MAX_VER_TILES-1)
+    col = rng.randrange(1, model.MAX_HOR_TILES-1)
+    while model.is_special(row, col):
+        row = rng.randrange(1, model.MAX_VER_TILES-1)
+        col = rng.randrange(1, model.MAX_HOR_TILES-1)
+    chance = rng.random()
+    if chance < 0.3:
+        model.tiles[model.index(row, col)] ^= PAINTED
+    elif model.is_wall(row, col):
+        model.set_type(row, col, PASSAGE)
+    elif chance < 0.5:
+        model.set_type(row, col, WALL)
+    return row, col
+
+def open_tiles(model):
+    return [i for i in range(len(model.tiles)) if model.is_open(i)]
+
+# Is a path a list of open tiles, each next to the one before, from start to
+# goal, and as long as the shortest.
+def is_shortest_path(model, path, start, goal, distance):
+    if distance == None:
+        return path == []
+    if len(path) != distance+1 or path[0] != start or path[-1] != goal:
+        return False
+    return all(abs(row1-row2) + abs(col1-col2) == 1 and not model.is_wall(row2, col2)
+               for (row1, col1), (row2, col2) in zip(path, path[1:]))
+
+# Is a next step one step closer to the goal, given every tile's distance to
+# the goal, or None when there is no step to take.
+def is_next_step(model, step, start_distance, distances):
+    if start_distance in (None, 0):
+        return step == None
+    return step != None and distances.get(model.index(*step)) == start_distance-1
+
+# Runs check(model, rng) after each of CHANGES changes to MAZES random mazes,
+# handing each change to the listener made by make_listener(model), if any.
+# Returns the number of questions asked and how many were answered wrongly.
+def run_check(check, make_listener=None):
+    rng = Random(0)
+    asked = 0
+    wrong = 0
+    for maze in range(MAZES):
+        model = random_maze(rng)
+        listener = make_listener(model) if make_listener != None else None
+        for change in range(CHANGES):
+            maze_asked, maze_wrong = check(model, listener, rng)
+            asked += maze_asked
+            wrong += maze_wrong
+            row, col = change_tile(model, rng)
+            if listener != None:
+                listener.tile_changed(row, col)
+    return asked, wrong
+
+# PathFinder doesn't listen for changes, so a new one is made each time.
+def check_pathfinder(model, listener, rng):
+    finder = PathFinder(model)
+    width = model.MAX_HOR_TILES
+    tiles = open_tiles(model)
+    wrong = 0
+    for query in range(QUERIES):
+        start, goal = rng.choice(tiles), rng.choice(tiles)
+        distance = plain_bfs(model, start).get(goal)
+        start_pos, goal_pos = divmod(start, width), divmod(goal, width)
+        for search in (finder.a_star, finder.bidirectional_bfs, finder.jump_point_search):
+            if not is_shortest_path(model, search(start_pos, goal_pos), start_pos, goal_pos, distance):
+                wrong += 1
+    return 3*QUERIES, wrong
+
+# Used for JunctionGraph and TreeDistance, which both take a start and goal
+# and keep up with changes themselves.
+def check_start_goal(model, finder, rng):
+    width = model.MAX_HOR_TILES
+    tiles = open_tiles(model)
+    wrong = 0
+    for query in range(QUERIES):
+        start, goal = rng.choice(tiles), rng.choice(tiles)
+        distances = plain_bfs(model, goal)
+        start_pos, goal_pos = divmod(start, width), divmod(goal, width)
+        distance = distances.get(start)
+        right = finder.get_distance(start_pos, goal_pos) == distance
+        right = right and is_next_step(model, finder.next_step(start_pos, goal_pos), distance, distances)
+        if isinstance(finder, JunctionGraph):
+            right = right and is_shortest_path(model, finder.get_path(start_pos, goal_pos), start_pos, goal_pos, distance)
+        if not right:
+            wrong += 1
+    return QUERIES, wrong
+
+# Asks about only a few tiles most of the time, so changes are made to
+# searches that are part way as well as finished.
+def check_distance_field(model, field, rng):
+    width = model.MAX_HOR_TILES
+    tiles = open_tiles(model)
+    if rng.random() < 0.3:
+        field.set_target(*divmod(rng.choice(tiles), width))
+    distances = plain_bfs(model, field.target)
+    if rng.random() < 0.2:
+        asked_about = tiles
+    else:
+        asked_about = [rng.choice(tiles) for query in range(3)]
+    wrong = 0
+    for i in asked_about:
+        distance = distances.get(i)
+        if field.get_distance(*divmod(i, width)) != distance:
+            wrong += 1
+        elif not is_next_step(model, field.next_step(*divmod(i, width)), distance, distances):
+            wrong += 1
+    return len(asked_about), wrong
+
+def make_distance_field(model):
+    field = DistanceField(model)
+    tiles = open_tiles(model)
+    field.set_target(*divmod(tiles[len(tiles)//2], model.MAX_HOR_TILES))
+    return field
+
+# Saves and loads mazes of several shapes, with and without an exit, items and
+# a seed. Only the tile types and exit flag are saved.
+def check_maze_file():
+    asked = 0
+    wrong = 0
+    rng = Random(1)
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "check.maze")
+        for vertical_cells, horizontal_cells in ((2, 2), (3, 5), (7, 9), (10, 13), (45, 45)):
+            for algorithm in ("backtracker", "kruskal", "eller"):
+                model = MazeModel(vertical_cells, horizontal_cells)
+                generate(model, algorithm, *model.get_random_cell(rng), 0.1, rng)
+                for has_exit in (False, True):
+                    exit_pos, items, maze_seed = None, [], None
+                    if has_exit:
+                        exit_pos = model.get_exit_wall(rng)
+                        model.make_exit(*exit_pos)
+                        items = [(1, 1, "JUMP"), (2*vertical_cells-1, 1, "BREAK")]
+                        maze_seed = rng.getrandbits(32)
+                    save_maze(path, model, exit_pos, items, maze_seed)
+                    loaded, loaded_exit, loaded_items, loaded_seed = load_maze(path)
+                    asked += 1
+                    if (bytes(tile & (TYPE_MASK | EXIT) for tile in loaded.tiles) != bytes(tile & (TYPE_MASK | EXIT) for tile in model.tiles)
+                            or (loaded_exit, loaded_items, loaded_seed) != (exit_pos, items, maze_seed)):
+                        wrong += 1
+    return asked, wrong
+
+def main():
+    results = [("PathFinder", run_check(check_pathfinder)),
+               ("JunctionGraph", run_check(check_start_goal, JunctionGraph)),
+               ("TreeDistance", run_check(check_start_goal, TreeDistance)),
+               ("DistanceField", run_check(check_distance_field, make_distance_field)),
+               ("maze file", check_maze_file())]
+    for name, (asked, wrong) in results:
+        print("%-14s %6d checked  %d wrong" % (name, asked, wrong))
+    if any(wrong != 0 for name, (asked, wrong) in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from random import random
+from maze_model import MazeModel, TYPE_MASK, WALL, CELL, PASSAGE, SPECIAL
+from maze_generators import EllerRows
+
+## CLASSES
+# A maze with no bottom, made a row of cells at a time with Eller's algorithm.
+# Only a window of window_cell_rows rows of cells is kept. advance() drops
+# rows from the top of the window and makes the same number of new rows at
+# the bottom, in the same bytearray, so the memory used never grows however
+# far the maze goes.
+# Everything else sees an ordinary MazeModel, with row 0 as the top of the
+# window. The top row is walled off, as the rows above it are gone. The
+# bottom row is walled off too until the rows below it are made, as which of
+# its walls are carved isn't decided until then.
+# Every set of cells in Eller's algorithm carves down at least once, so every
+# group of joined cells in the window reaches its bottom row, and from there
+# the rows still to be made. That is all that is promised: the window is
+# often in more than one part, each joined to the others only through rows
+# that are gone or not made yet. Cells that were only joined through rows
+# that are gone always reach the top row of cells, so every wall in that row
+# is carved once rows are dropped, which joins those parts again.
+class EndlessMaze(MazeModel):
+    def __init__(self, cells, window_cell_rows, loop_chance):
+        super().__init__(window_cell_rows, cells)
+        self.cells = cells
+        self.loop_chance = loop_chance
+        self.rows = EllerRows(cells)
+        border_row = bytes([SPECIAL])*self.MAX_HOR_TILES
+        tiles = bytearray(border_row)
+        for cell_row in range(window_cell_rows):
+            east, south = self.rows.next_row()
+            tiles += self.__make_cell_row(east)
+            if cell_row < window_cell_rows-1:
+                tiles += self.__make_wall_row(south)
+            else:
+                tiles += border_row
+        # Which cells of the bottom row carve down, kept until the next rows
+        # are made.
+        self.pending_south = south
+        self.tiles[:] = tiles
+
+    # A row of cells, with the walls between them carved where Eller's
+    # algorithm joined them, or with a chance of loop_chance.
+    def __make_cell_row(self, east):
+        row = bytearray([SPECIAL])
+        for col in range(self.cells):
+            row.append(CELL)
+            if col < self.cells-1:
+                if east[col] or random() <= self.loop_chance:
+                    row.append(PASSAGE)
+                else:
+                    row.append(WALL)
+        row.append(SPECIAL)
+        return row
+
+    # The row of walls under a row of cells.
+    def __make_wall_row(self, south):
+        row = bytearray([SPECIAL])
+        for col in range(self.cells):
+            if south[col] or random() <= self.loop_chance:
+                row.append(PASSAGE)
+            else:
+                row.append(WALL)
+            row.append(SPECIAL)
+        return row
+
+    # Drops cell_rows rows of cells from the top of the window and makes as
+    # many new ones at the bottom. Every tile moves up by 2*cell_rows rows.
+    def advance(self, cell_rows):
+        width = self.MAX_HOR_TILES
+        tiles = self.tiles
+        del tiles[:2*cell_rows*width]
+        tiles[:width] = bytes([SPECIAL])*width
+        # Walls are opened keeping their flags, so painted tiles stay painted.
+        for i in range(width+2, 2*width-2, 2):
+            tiles[i] = tiles[i] & ~TYPE_MASK | PASSAGE
+        tiles[-width:] = self.__make_wall_row(self.pending_south)
+        for cell_row in range(cell_rows):
+            east, south = self.rows.next_row()
+            tiles += self.__make_cell_row(east)
+            if cell_row < cell_rows-1:
+                tiles += self.__make_wall_row(south)
+            else:
+                tiles += bytes([SPECIAL])*width
+        self.pending_south = south
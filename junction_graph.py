@@ -0,0 +1,322 @@
+from array import array
+from heapq import heappush, heappop
+from maze_model import TYPE_MASK, WALL
+
+## CLASSES
+# The maze as a graph of junctions and dead ends joined by corridors. Mazes
+# are mostly long corridors, and a search only has to make a choice where a
+# corridor ends, so searching this graph looks at far fewer tiles than
+# searching the tiles themselves.
+# Any open tile without exactly two open neighbours is a node. Every other
+# open tile is inside exactly one corridor, and knows which corridor that is
+# and how many steps it is from the corridor's first end.
+# When a tile changes, only the corridors running through it and its
+# neighbours are traced again.
+class JunctionGraph():
+    def __init__(self, model):
+        self.model = model
+        size = len(model.tiles)
+        self.width = model.MAX_HOR_TILES
+        self.steps = model.steps
+        self.is_node = bytearray(size)
+        self.corridor_of = array('i', [-1])*size
+        self.offset_of = array('i', bytes(4*size))
+        # Corridor number -> [first end, step from it into the corridor,
+        # last end, step from it into the corridor, length]. The length is
+        # the number of steps from one end to the other.
+        self.corridors = {}
+        # Node -> {corridor number: (node at the other end, length)} for the
+        # corridors that end at it.
+        self.node_corridors = {}
+        self.next_id = 0
+        self.__build()
+
+    # Number of open tiles next to an open tile.
+    def __degree(self, i):
+        tiles = self.model.tiles
+        degree = 0
+        for step in self.steps:
+            if tiles[i+step] & TYPE_MASK != WALL:
+                degree += 1
+        return degree
+
+    def __build(self):
+        tiles = self.model.tiles
+        nodes = []
+        for i in range(len(tiles)):
+            if tiles[i] & TYPE_MASK != WALL and self.__degree(i) != 2:
+                self.__add_node(i)
+                nodes.append(i)
+        for node in nodes:
+            self.__trace_from(node)
+        # A ring of corridor tiles with no junction on it would be missed, so
+        # one of its tiles is made into a node.
+        for i in range(len(tiles)):
+            if tiles[i] & TYPE_MASK != WALL and not self.is_node[i] and self.corridor_of[i] == -1:
+                self.__add_node(i)
+                self.__trace_from(i)
+
+    def __add_node(self, i):
+        self.is_node[i] = 1
+        self.node_corridors[i] = {}
+
+    # Traces a corridor in every open direction from a node that doesn't
+    # already have one.
+    def __trace_from(self, node):
+        for step in self.steps:
+            if self.model.is_open(node+step) and not self.__has_corridor(node, step):
+                self.__trace(node, step)
+
+    def __has_corridor(self, node, step):
+        for corridor_id in self.node_corridors[node]:
+            first, first_step, last, last_step, length = self.corridors[corridor_id]
+            if (first == node and first_step == step) or (last == node and last_step == step):
+                return True
+        return False
+
+    # Walks from a node along a corridor until it reaches another node, and
+    # stores the corridor.
+    def __trace(self, node, step):
+        tiles = self.model.tiles
+        steps = self.steps
+        corridor_id = self.next_id
+        self.next_id += 1
+        previous = node
+        current = node + step
+        length = 1
+        while not self.is_node[current]:
+            self.corridor_of[current] = corridor_id
+            self.offset_of[current] = length
+            # A corridor tile has exactly two open neighbours, so carry on to
+            # the one that wasn't just left.
+            for next_step in steps:
+                following = current + next_step
+                if following != previous and tiles[following] & TYPE_MASK != WALL:
+                    break
+            previous = current
+            current = following
+            length += 1
+        self.corridors[corridor_id] = [node, step, current, previous-current, length]
+        self.node_corridors[node][corridor_id] = (current, length)
+        self.node_corridors[current][corridor_id] = (node, length)
+
+    def __remove_corridor(self, corridor_id):
+        first, first_step, last, last_step, length = self.corridors[corridor_id]
+        for i in self.__corridor_tiles(corridor_id):
+            self.corridor_of[i] = -1
+        del self.corridors[corridor_id]
+        for node in (first, last):
+            if node in self.node_corridors:
+                self.node_corridors[node].pop(corridor_id, None)
+
+    # Returns the tiles inside a corridor, in order from its first end. Each
+    # tile is followed by the neighbour one further along the same corridor,
+    # so this still works after the tiles around the corridor have changed.
+    def __corridor_tiles(self, corridor_id):
+        first, first_step, last, last_step, length = self.corridors[corridor_id]
+        corridor_of = self.corridor_of
+        offset_of = self.offset_of
+        corridor_tiles = []
+        current = first + first_step
+        for offset in range(2, length+1):
+            corridor_tiles.append(current)
+            for step in self.steps:
+                following = current + step
+                if corridor_of[following] == corridor_id and offset_of[following] == offset:
+                    break
+            current = following
+        return corridor_tiles
+
+    # Used as a listener for Grid.tile_changed. If the tile was opened or
+    # closed, the corridors through it and its neighbours are removed, which
+    # of those tiles are nodes is worked out again, and corridors are traced
+    # again from every node that lost one.
+    def tile_changed(self, row, col):
+        i = row*self.width + col
+        was_open = self.is_node[i] or self.corridor_of[i] != -1
+        if was_open == self.model.is_open(i):
+            return
+        affected = [i] + [i+step for step in self.steps if self.is_node[i+step] or self.corridor_of[i+step] != -1]
+        retrace = set()
+        for tile in affected:
+            if self.is_node[tile]:
+                for corridor_id in list(self.node_corridors[tile]):
+                    first, first_step, last, last_step, length = self.corridors[corridor_id]
+                    retrace.add(first)
+                    retrace.add(last)
+                    self.__remove_corridor(corridor_id)
+            elif self.corridor_of[tile] != -1:
+                first, first_step, last, last_step, length = self.corridors[self.corridor_of[tile]]
+                retrace.add(first)
+                retrace.add(last)
+                self.__remove_corridor(self.corridor_of[tile])
+        for tile in affected:
+            if self.is_node[tile]:
+                self.is_node[tile] = 0
+                del self.node_corridors[tile]
+            if self.model.is_open(tile) and self.__degree(tile) != 2:
+                self.__add_node(tile)
+                retrace.add(tile)
+        for node in retrace:
+            if self.is_node[node]:
+                self.__trace_from(node)
+        # Closing a tile can leave a ring with no node on it.
+        for tile in affected:
+            if self.model.is_open(tile) and not self.is_node[tile] and self.corridor_of[tile] == -1:
+                self.__add_node(tile)
+                self.__trace_from(tile)
+
+    # Returns the nodes a tile can get to without passing another node, as
+    # (node, steps, corridor number or None, which end of the corridor).
+    def __get_ends(self, i):
+        if self.is_node[i]:
+            return [(i, 0, None, 0)]
+        corridor_id = self.corridor_of[i]
+        first, first_step, last, last_step, length = self.corridors[corridor_id]
+        offset = self.offset_of[i]
+        return [(first, offset, corridor_id, 0), (last, length-offset, corridor_id, 1)]
+
+    # Manhattan distance between two indexes. A corridor is never shorter than
+    # this, so it can be used as the A* heuristic.
+    def __heuristic(self, i, goal):
+        row1, col1 = divmod(i, self.width)
+        row2, col2 = divmod(goal, self.width)
+        return abs(row1-row2) + abs(col1-col2)
+
+    # A* over the nodes. Returns the length of the shortest path and enough
+    # to rebuild it, or None if there isn't one.
+    def __search(self, start, goal):
+        if not self.model.is_open(start) or not self.model.is_open(goal):
+            return None
+        if start == goal:
+            return 0, None, None, {}
+        best = None
+        best_end = None
+        start_ends = self.__get_ends(start)
+        goal_ends = {}
+        for node, steps, corridor_id, end in self.__get_ends(goal):
+            goal_ends.setdefault(node, []).append((steps, corridor_id, end))
+        # Both tiles inside the same corridor can reach each other directly.
+        if not self.is_node[start] and self.corridor_of[start] == self.corridor_of[goal]:
+            best = abs(self.offset_of[start] - self.offset_of[goal])
+        costs = {}
+        # Node -> (previous node, corridor used) or the start end taken.
+        parents = {}
+        open_list = []
+        for node, steps, corridor_id, end in start_ends:
+            if node not in costs or steps < costs[node]:
+                costs[node] = steps
+                parents[node] = ("START", corridor_id, end)
+                heappush(open_list, (steps + self.__heuristic(node, goal), steps, node))
+        closed = set()
+        node_corridors = self.node_corridors
+        width = self.width
+        goal_row, goal_col = divmod(goal, width)
+        while len(open_list) != 0:
+            total, cost, node = heappop(open_list)
+            if best != None and total >= best:
+                break
+            if node in closed:
+                continue
+            closed.add(node)
+            for steps, corridor_id, end in goal_ends.get(node, ()):
+                if best == None or cost+steps < best:
+                    best = cost+steps
+                    best_end = (node, corridor_id, end)
+            for corridor_id, (other, length) in node_corridors[node].items():
+                if other in closed:
+                    continue
+                new_cost = cost+length
+                if other not in costs or new_cost < costs[other]:
+                    costs[other] = new_cost
+                    parents[other] = (node, corridor_id, None)
+                    row, col = divmod(other, width)
+                    heappush(open_list, (new_cost+abs(row-goal_row)+abs(col-goal_col), new_cost, other))
+        if best == None:
+            return None
+        return best, best_end, start_ends, parents
+
+    # Returns the number of steps between two tiles, or None if one can't be
+    # reached from the other.
+    def get_distance(self, start, goal):
+        result = self.__search(self.model.index(*start), self.model.index(*goal))
+        if result == None:
+            return None
+        return result[0]
+
+    # Returns the shortest path between two tiles as a list of (row, col),
+    # start first, or an empty list if there isn't one.
+    def get_path(self, start, goal):
+        start = self.model.index(*start)
+        goal = self.model.index(*goal)
+        result = self.__search(start, goal)
+        if result == None:
+            return []
+        distance, best_end, start_ends, parents = result
+        if best_end == None:
+            # Either the same tile, or a straight walk along one corridor.
+            path = [start]
+            if start != goal:
+                path += self.__walk_inside(start, goal)
+            return [divmod(i, self.width) for i in path]
+        # From the goal back to the node it was reached from. A goal that is a
+        # node is added by the loop below.
+        node, corridor_id, end = best_end
+        backwards = []
+        if corridor_id != None:
+            backwards = [goal] + self.__walk_to_end(goal, corridor_id, end)[:-1]
+        # Then from node to node back to the start.
+        while True:
+            previous, corridor_id, end = parents[node]
+            backwards.append(node)
+            if previous == "START":
+                if corridor_id != None:
+                    backwards += self.__walk_to_end(start, corridor_id, end)[-2::-1]
+                    backwards.append(start)
+                break
+            first, first_step, last, last_step, length = self.corridors[corridor_id]
+            if first == node:
+                backwards += self.__corridor_tiles(corridor_id)
+            else:
+                backwards += self.__corridor_tiles(corridor_id)[::-1]
+            node = previous
+        backwards.reverse()
+        return [divmod(i, self.width) for i in backwards]
+
+    # Returns the tiles from a tile inside a corridor to one of its ends, not
+    # counting the tile itself but counting the end.
+    def __walk_to_end(self, i, corridor_id, end):
+        first, first_step, last, last_step, length = self.corridors[corridor_id]
+        corridor_tiles = self.__corridor_tiles(corridor_id)
+        position = self.offset_of[i]-1
+        if end == 0:
+            return corridor_tiles[position-1::-1] + [first] if position > 0 else [first]
+        return corridor_tiles[position+1:] + [last]
+
+    # Returns the tiles from one tile to another inside the same corridor, not
+    # counting the first one.
+    def __walk_inside(self, start, goal):
+        corridor_id = self.corridor_of[start]
+        first, first_step, last, last_step, length = self.corridors[corridor_id]
+        corridor_tiles = self.__corridor_tiles(corridor_id)
+        a = self.offset_of[start]-1
+        b = self.offset_of[goal]-1
+        if a < b:
+            return corridor_tiles[a+1:b+1]
+        return corridor_tiles[b:a][::-1]
+
+    # Returns the tile to move onto to get one step closer to the goal, or
+    # None if the start is the goal or can't reach it.
+    def next_step(self, start, goal):
+        path = self.get_path(start, goal)
+        if len(path) < 2:
+            return None
+        return path[1]
+
+    # Counts that describe the maze, for example to judge how hard it is.
+    def get_stats(self):
+        lengths = [corridor[4] for corridor in self.corridors.values()]
+        return {"nodes": len(self.node_corridors),
+                "corridors": len(self.corridors),
+                "mean_corridor_length": sum(lengths)/len(lengths) if len(lengths) != 0 else 0,
+                "longest_corridor": max(lengths) if len(lengths) != 0 else 0}
@@ -0,0 +1,168 @@
+from maze_model import TYPE_MASK, WALL
+from navigation import DistanceField
+try:
+    import numpy as np
+except ImportError:
+    # Without NumPy, analyse() falls back to going one cell at a time.
+    np = None
+
+## FUNCTIONS
+# Returns an analysis of a maze: a MazeAnalysis if NumPy is there, or else a
+# CellByCellAnalysis, which gives the same answers more slowly. Everything
+# that counts dead ends, junctions or loops, or scores a maze, goes through
+# here, so there is one place that works them out.
+def analyse(model):
+    if np == None:
+        return CellByCellAnalysis(model)
+    return MazeAnalysis(model)
+
+## CLASSES
+# Looks at the whole maze at once with NumPy rather than one cell at a time.
+# The tiles are viewed as a 2D array, and slicing every other row and column
+# gives an array per direction of whether each cell's wall that way is open,
+# so the number of open sides of every cell is just the sum of four arrays.
+# The analysis is of the maze as it was when it was made. The exit is a wall
+# with a flag, so it doesn't count as an open side, the same as in
+# MazeModel.is_dead_end().
+class MazeAnalysis():
+    def __init__(self, model):
+        self.model = model
+        height = model.MAX_VER_TILES
+        width = model.MAX_HOR_TILES
+        # A view of the bytearray, only kept while the open tiles are worked
+        # out, so the model can still change size afterwards.
+        tiles = np.frombuffer(model.tiles, dtype=np.uint8).reshape(height, width)
+        open_tiles = (tiles & TYPE_MASK) != WALL
+        del tiles
+        self.north = open_tiles[0:-1:2, 1::2]
+        self.south = open_tiles[2::2, 1::2]
+        self.west = open_tiles[1::2, 0:-1:2]
+        self.east = open_tiles[1::2, 2::2]
+        self.neighbour_counts = (self.north.view(np.uint8) + self.south.view(np.uint8)
+                                 + self.west.view(np.uint8) + self.east.view(np.uint8))
+        self.dead_ends = self.neighbour_counts == 1
+        self.corridors = self.neighbour_counts == 2
+        self.junctions = self.neighbour_counts >= 3
+        # Passages between two cells. A maze where every cell is joined up
+        # needs one fewer than there are cells, and each one past that makes
+        # a loop.
+        passages = int(np.count_nonzero(self.east[:, :-1])) + int(np.count_nonzero(self.south[:-1, :]))
+        self.loops = passages - self.neighbour_counts.size + 1
+        # Only made once a distance is asked for.
+        self.neighbours = None
+
+    def get_stats(self):
+        return {"dead_ends": int(np.count_nonzero(self.dead_ends)),
+                "corridors": int(np.count_nonzero(self.corridors)),
+                "junctions": int(np.count_nonzero(self.junctions)),
+                "loops": self.loops}
+
+    # Returns the row and column of every dead end, row by row, only in the
+    # given rows of cells if rows is given. The rows have to be in order.
+    def get_dead_end_cells(self, rows=None):
+        cell_rows, cell_cols = np.nonzero(self.dead_ends)
+        if rows != None:
+            keep = np.isin(cell_rows, [(row-1)//2 for row in rows])
+            cell_rows = cell_rows[keep]
+            cell_cols = cell_cols[keep]
+        return list(zip((2*cell_rows+1).tolist(), (2*cell_cols+1).tolist()))
+
+    # Returns the number of steps between two cells, or None if one can't be
+    # reached from the other. It is a breadth first search over the cells,
+    # with each step of it done for the whole frontier at once, so it costs
+    # a handful of array operations for every cell along the path.
+    def get_distance(self, start, goal):
+        if self.neighbours is None:
+            self.__make_neighbours()
+        cols = self.neighbour_counts.shape[1]
+        start_cell = (start[0]//2)*cols + start[1]//2
+        goal_cell = (goal[0]//2)*cols + goal[1]//2
+        neighbours = self.neighbours
+        # A number for each time a cell was put in the frontier, or -1 for a
+        # cell not reached yet. A cell reached from two cells at once gets
+        # both numbers in turn, and is only kept where its last one is.
+        marks = self.unreached.copy()
+        marks[start_cell] = 0
+        order = self.order
+        used = 1
+        frontier = np.array([start_cell])
+        steps = 0
+        while marks[goal_cell] < 0:
+            if frontier.size == 0:
+                return None
+            steps += 1
+            frontier = neighbours[frontier].ravel()
+            frontier = frontier[marks[frontier] < 0]
+            numbers = order[used:used+frontier.size]
+            used += frontier.size
+            marks[frontier] = numbers
+            frontier = frontier[marks[frontier] == numbers]
+        # Every step between cells crosses a wall tile as well.
+        return 2*steps
+
+    # The cell the other side of each open side of every cell, north, east,
+    # south and west, so a step of the search is a single lookup. A side
+    # that is a wall leads to an extra cell past the last one, which is
+    # marked as reached before the search starts, so it is never stepped to.
+    # Each open side is looked through at most once a search, so there are
+    # never more numbers needed than there are sides.
+    def __make_neighbours(self):
+        rows, cols = self.neighbour_counts.shape
+        size = rows*cols
+        cells = np.arange(size).reshape(rows, cols)
+        self.neighbours = np.stack((np.where(self.north, cells-cols, size), np.where(self.east, cells+1, size),
+                                    np.where(self.south, cells+cols, size), np.where(self.west, cells-1, size)),
+                                   axis=-1).reshape(size, 4)
+        self.unreached = np.full(size+1, -1, dtype=np.intp)
+        self.unreached[size] = 0
+        self.order = np.arange(4*size+1)
+
+    # Steps from a cell to the exit, through the cell in front of it.
+    def get_exit_distance(self, start, exit_pos):
+        distance = self.get_distance(start, self.model.get_cell_near_exit(*exit_pos))
+        if distance == None:
+            return None
+        return distance + 1
+
+# Same as MazeAnalysis, without NumPy. Each cell's open sides are counted one
+# at a time, and distances come from a DistanceField.
+class CellByCellAnalysis():
+    def __init__(self, model):
+        self.model = model
+
+    def get_stats(self):
+        tiles = self.model.tiles
+        width = self.model.MAX_HOR_TILES
+        counts = {"dead_ends": 0, "corridors": 0, "junctions": 0}
+        passages = 0
+        for row in range(1, self.model.MAX_VER_TILES, 2):
+            for i in range(row*width+1, row*width+width-1, 2):
+                sides = 0
+                for step in self.model.steps:
+                    if tiles[i+step] & TYPE_MASK != WALL:
+                        sides += 1
+                if sides == 1:
+                    counts["dead_ends"] += 1
+                elif sides == 2:
+                    counts["corridors"] += 1
+                elif sides >= 3:
+                    counts["junctions"] += 1
+                passages += sides
+        cells = (self.model.MAX_VER_TILES//2)*(width//2)
+        # Every passage is counted from both of its cells.
+        counts["loops"] = passages//2 - cells + 1
+        return counts
+
+    def get_dead_end_cells(self, rows=None):
+        return self.model.get_dead_end_cells(rows)
+
+    def get_distance(self, start, goal):
+        field = DistanceField(self.model)
+        field.set_target(*goal)
+        return field.get_distance(*start)
+
+    def get_exit_distance(self, start, exit_pos):
+        distance = self.get_distance(start, self.model.get_cell_near_exit(*exit_pos))
+        if distance == None:
+            return None
+        return distance + 1
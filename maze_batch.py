@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from maze_generators import GENERATORS, generate_seeded, play_rng
+from maze_file import MazeCache
+from maze_analysis import analyse
+
+FORMATS = ("maze", "text", "none")
+
+# Numbers worked out for every maze, summed up at the end.
+STATS = ("dead_ends", "junctions", "loops", "items", "exit_distance", "generate_ms")
+
+## FUNCTIONS
+# Makes one maze the same way a World given its seed does, writes it out and
+# returns its row of stats. The maze file is named the way MazeCache names
+# it, so a directory of them can be used as a cache by the game.
+def make_maze(task):
+    maze_seed, rows, cols, algorithm, loop_chance, item_chance, out_format, out_directory = task
+    start_time = perf_counter()
+    model, exit_pos, items = generate_seeded(maze_seed, rows, cols, algorithm, loop_chance, item_chance)
+    generate_ms = (perf_counter()-start_time)*1000
+    # The player starts where they would in a World with this seed.
+    spawn = model.get_random_cell(play_rng(maze_seed))
+    analysis = analyse(model)
+    stats = analysis.get_stats()
+    path = None
+    if out_format == "maze":
+        cache = MazeCache(out_directory)
+        path = cache.get_path(maze_seed, rows, cols, algorithm, loop_chance, item_chance)
+        cache.save(model, exit_pos, items, maze_seed, algorithm, loop_chance, item_chance)
+    elif out_format == "text":
+        path = os.path.join(out_directory, "%d_%dx%d_%s.txt" % (maze_seed, rows, cols, algorithm))
+        with open(path, "w") as file:
+            file.write(model.get_text() + "\n")
+    return {"seed": maze_seed, "rows": rows, "cols": cols, "algorithm": algorithm,
+            "dead_ends": stats["dead_ends"], "junctions": stats["junctions"], "loops": stats["loops"],
+            "items": len(items), "exit_distance": analysis.get_exit_distance(spawn, exit_pos), "generate_ms": round(generate_ms, 2), "path": path}
+
+# Makes every maze across a pool of processes. Each row of stats is written
+# to the stats file as soon as its maze is done, in the order they finish,
+# so nothing is lost if the run is stopped. Returns every row.
+def make_mazes(tasks, workers, stats_path):
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(stats_path, "w") as stats_file:
+        futures = [executor.submit(make_maze, task) for task in tasks]
+        for future in as_completed(futures):
+            row = future.result()
+            stats_file.write(json.dumps(row) + "\n")
+            stats_file.flush()
+            rows.append(row)
+    return rows
+
+def print_summary(rows):
+    print("stat           mean       min        max")
+    for name in STATS:
+        values = [row[name] for row in rows]
+        print("%-14s %-10.2f %-10s %s" % (name, sum(values)/len(values), min(values), max(values)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Makes a batch of mazes, one for each seed, and writes them out with their stats.")
+    parser.add_argument("--size", nargs=2, type=int, default=(45, 45), metavar=("ROWS", "COLS"), help="cells down and across")
+    parser.add_argument("--algorithm", default="backtracker", choices=list(GENERATORS))
+    parser.add_argument("--loop-chance", type=float, default=0.05)
+    parser.add_argument("--item-chance", type=float, default=0.2)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--count", type=int, default=100, help="mazes to make, with seeds counting up from the first")
+    parser.add_argument("--format", default="maze", choices=FORMATS, help="maze files, text, or just the stats")
+    parser.add_argument("--out", default="mazes", help="directory the mazes and stats are written to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    rows, cols = args.size
+    tasks = [(maze_seed, rows, cols, args.algorithm, args.loop_chance, args.item_chance, args.format, args.out)
+             for maze_seed in range(args.first_seed, args.first_seed+args.count)]
+    stats_path = os.path.join(args.out, "stats.jsonl")
+    start_time = perf_counter()
+    results = make_mazes(tasks, args.workers, stats_path)
+    elapsed = perf_counter()-start_time
+    print_summary(results)
+    print("%d mazes in %.1f s on %d workers (%.1f mazes/s), stats written to %s" % (len(results), elapsed, args.workers, len(results)/elapsed, stats_path))
+
+if __name__ == "__main__":
+    main()
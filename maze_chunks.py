@@ -0,0 +1,133 @@
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from random import Random
+from maze_model import MazeModel, PASSAGE
+
+# Each chunk is a square of this many cells a side.
+CHUNK_CELLS = 64
+
+# How many doors join each pair of chunks next to each other.
+DOORS_PER_SIDE = 2
+
+## FUNCTIONS
+# Returns a seed made from the world's seed and any other numbers, such as the
+# position of a chunk. It is a hash rather than Python's hash(), so it is the
+# same in every process and every run.
+def make_seed(world_seed, *key):
+    digest = blake2b(repr((world_seed,) + key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+# Returns the cells along a border that have a door in them. "row" borders are
+# along the top of chunk (chunk_x, chunk_y), and "col" borders down its left.
+# Both chunks on either side of a border work out the same doors from it.
+def get_doors(world_seed, border, chunk_x, chunk_y):
+    rng = Random(make_seed(world_seed, border, chunk_x, chunk_y))
+    return rng.sample(range(CHUNK_CELLS), DOORS_PER_SIDE)
+
+# Makes the chunk at (chunk_x, chunk_y) of a world. It only depends on its
+# arguments, so chunks can be made in any order, on any thread, and made
+# again after being dropped.
+# Inside, the chunk is a maze made by the recursive backtracker, so every cell
+# in it is joined. Every chunk has doors to all four chunks next to it, so
+# every cell in the world is joined.
+def make_chunk(world_seed, chunk_x, chunk_y, loop_chance=0):
+    rng = Random(make_seed(world_seed, "chunk", chunk_x, chunk_y))
+    model = MazeModel(CHUNK_CELLS, CHUNK_CELLS)
+    model.recursive_backtracker(*model.get_random_cell(rng), loop_chance, rng)
+    last = model.MAX_VER_TILES-1
+    for cell in get_doors(world_seed, "row", chunk_x, chunk_y):
+        model.set_type(0, 2*cell+1, PASSAGE)
+    for cell in get_doors(world_seed, "row", chunk_x, chunk_y+1):
+        model.set_type(last, 2*cell+1, PASSAGE)
+    for cell in get_doors(world_seed, "col", chunk_x, chunk_y):
+        model.set_type(2*cell+1, 0, PASSAGE)
+    for cell in get_doors(world_seed, "col", chunk_x+1, chunk_y):
+        model.set_type(2*cell+1, last, PASSAGE)
+    return model
+
+## CLASSES
+# A maze with no edges, split into chunks that are made when they are needed
+# and dropped when they are far away. Tiles are read with the same methods as
+# a MazeModel, using rows and columns of the whole world, which can be
+# negative.
+# Chunks next to each other share the row or column of tiles between them.
+# Each chunk owns its top row and left column, and the other two are only
+# kept so a chunk can be used on its own.
+# Chunks are made on a pool of threads. Asking for a tile of a chunk that
+# isn't ready waits for it, so update() should be called with the camera's
+# position often enough that chunks are ready before they are looked at.
+# Tiles that are changed are lost when their chunk is dropped, as the chunk
+# is made again from its seed.
+class ChunkedMaze():
+    def __init__(self, world_seed, loop_chance=0, workers=2, prefetch_radius=1, keep_radius=2):
+        self.world_seed = world_seed
+        self.loop_chance = loop_chance
+        self.prefetch_radius = prefetch_radius
+        self.keep_radius = keep_radius
+        # Tiles from the top of one chunk to the top of the next.
+        self.span = 2*CHUNK_CELLS
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # (chunk_x, chunk_y) -> future of the chunk's MazeModel.
+        self.chunks = {}
+
+    # Returns the chunk a tile is in, and the tile's row and column in it.
+    def locate(self, row, col):
+        chunk_y, local_row = divmod(row, self.span)
+        chunk_x, local_col = divmod(col, self.span)
+        return (chunk_x, chunk_y), local_row, local_col
+
+    # Starts making a chunk on the pool, unless it is already made or being
+    # made.
+    def request(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        if key not in self.chunks:
+            self.chunks[key] = self.executor.submit(make_chunk, self.world_seed, chunk_x, chunk_y, self.loop_chance)
+
+    # Returns a chunk's MazeModel, waiting for it if it isn't made yet.
+    def get_chunk(self, chunk_x, chunk_y):
+        self.request(chunk_x, chunk_y)
+        return self.chunks[(chunk_x, chunk_y)].result()
+
+    def is_ready(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        return key in self.chunks and self.chunks[key].done()
+
+    # Makes every chunk within prefetch_radius chunks of a tile, and drops
+    # every chunk further than keep_radius from it. Chunks that haven't been
+    # started yet are cancelled.
+    def update(self, row, col):
+        (centre_x, centre_y), local_row, local_col = self.locate(row, col)
+        radius = self.prefetch_radius
+        for chunk_y in range(centre_y-radius, centre_y+radius+1):
+            for chunk_x in range(centre_x-radius, centre_x+radius+1):
+                self.request(chunk_x, chunk_y)
+        for key in list(self.chunks):
+            if max(abs(key[0]-centre_x), abs(key[1]-centre_y)) > self.keep_radius:
+                self.chunks.pop(key).cancel()
+
+    # Stops the threads. Chunks not started yet are cancelled.
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def get_type(self, row, col):
+        key, local_row, local_col = self.locate(row, col)
+        return self.get_chunk(*key).get_type(local_row, local_col)
+
+    def is_wall(self, row, col):
+        key, local_row, local_col = self.locate(row, col)
+        return self.get_chunk(*key).is_wall(local_row, local_col)
+
+    def is_special(self, row, col):
+        key, local_row, local_col = self.locate(row, col)
+        return self.get_chunk(*key).is_special(local_row, local_col)
+
+    # Changes the type of a tile until its chunk is dropped.
+    def set_type(self, row, col, tile_type):
+        key, local_row, local_col = self.locate(row, col)
+        self.get_chunk(*key).set_type(local_row, local_col, tile_type)
+
+    # Displays a part of the world in a textual form, like
+    # MazeModel.print_grid().
+    def print_area(self, first_row, first_col, rows, cols):
+        for row in range(first_row, first_row+rows):
+            print("".join("H " if self.is_wall(row, col) else "  " for col in range(first_col, first_col+cols)))
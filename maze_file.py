@@ -0,0 +1,130 @@
+import mmap
+import os
+import struct
+from maze_model import MazeModel, WALL, CELL, PASSAGE, SPECIAL, OPEN_TABLE
+
+## FILE FORMAT
+# A maze file is a header, then the walls, then the items.
+# The header holds the magic bytes, the version, flags for whether there is
+# an exit and a seed, the number of rows and columns of cells, the exit's row
+# and column, the number of items and the seed.
+# Every cell has two bits for its east and south walls, set if they are
+# carved, and each row of cells is packed into whole bytes, four cells to a
+# byte, starting from the lowest bits. The border and the walls on even rows
+# and columns are always the same, so they aren't stored.
+# Each item is its row, its column and its type.
+MAGIC = b"MAZE"
+VERSION = 1
+HEADER = struct.Struct("<4sBBxxIIIIIQ")
+ITEM = struct.Struct("<IIB")
+HAS_EXIT = 1
+HAS_SEED = 2
+
+# Item types by their number in the file.
+ITEM_TYPES = ("BREAK", "JUMP")
+
+# Four cells of walls, each as bits: east, south, east, south and so on,
+# against their packed byte.
+PACK_TABLE = {bytes((byte >> bit) & 1 for bit in range(8)): byte for byte in range(256)}
+
+# Packed bytes against the tiles they stand for: a row of cells with the
+# walls between them, and the row of walls under it with the pillars.
+CELL_ROW_TABLE = [bytes([CELL, PASSAGE if (byte >> 2*cell) & 1 else WALL][position] for cell in range(4) for position in (0, 1))
+                  for byte in range(256)]
+WALL_ROW_TABLE = [bytes([PASSAGE if (byte >> 2*cell+1) & 1 else WALL, SPECIAL][position] for cell in range(4) for position in (0, 1))
+                  for byte in range(256)]
+
+## FUNCTIONS
+# Returns the packed walls of one row of cells.
+def pack_row(model, cell_row):
+    width = model.MAX_HOR_TILES
+    cells = width//2
+    row = 2*cell_row+1
+    bits = bytearray(-(-cells//4)*8)
+    bits[0:2*cells:2] = model.tiles[row*width+2:(row+1)*width:2].translate(OPEN_TABLE)
+    if row+1 < model.MAX_VER_TILES-1:
+        bits[1:2*cells:2] = model.tiles[(row+1)*width+1:(row+2)*width:2].translate(OPEN_TABLE)
+    bits = bytes(bits)
+    return bytes(PACK_TABLE[bits[i:i+8]] for i in range(0, len(bits), 8))
+
+# Writes a maze to a file. The exit is a (row, col) of a tile, and the items a
+# list of (row, col, type). The file is written next to where it goes and
+# then moved there, so nothing ever reads half a file.
+def save_maze(path, model, exit_pos=None, items=(), seed=None):
+    flags = 0
+    exit_row, exit_col = 0, 0
+    if exit_pos != None:
+        flags |= HAS_EXIT
+        exit_row, exit_col = exit_pos
+    if seed != None:
+        flags |= HAS_SEED
+    temporary_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(temporary_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, flags, model.MAX_VER_TILES//2, model.MAX_HOR_TILES//2,
+                               exit_row, exit_col, len(items), seed if seed != None else 0))
+        for cell_row in range(model.MAX_VER_TILES//2):
+            file.write(pack_row(model, cell_row))
+        for row, col, item_type in items:
+            file.write(ITEM.pack(row, col, ITEM_TYPES.index(item_type)))
+    os.replace(temporary_path, path)
+
+# Reads a maze from a file, and returns the MazeModel, the exit, the items and
+# the seed, as given to save_maze(). The exit and seed are None if there
+# weren't any. The file is mapped into memory rather than read, and every
+# packed byte is turned into tiles with a lookup, so nothing is worked out
+# tile by tile.
+def load_maze(path):
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < HEADER.size:
+            raise ValueError("%s is not a maze file" % path)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, flags, vertical_cells, horizontal_cells, exit_row, exit_col, item_count, seed = HEADER.unpack_from(data)
+            if magic != MAGIC:
+                raise ValueError("%s is not a maze file" % path)
+            if version != VERSION:
+                raise ValueError("%s is version %d, only version %d can be read" % (path, version, VERSION))
+            model = MazeModel(vertical_cells, horizontal_cells)
+            width = model.MAX_HOR_TILES
+            row_bytes = -(-horizontal_cells//4)
+            border = bytes([SPECIAL])
+            tiles = bytearray(model.tiles[:width])
+            offset = HEADER.size
+            for cell_row in range(vertical_cells):
+                packed = data[offset:offset+row_bytes]
+                offset += row_bytes
+                tiles += border + b"".join(map(CELL_ROW_TABLE.__getitem__, packed))[:width-2] + border
+                if cell_row < vertical_cells-1:
+                    tiles += border + b"".join(map(WALL_ROW_TABLE.__getitem__, packed))[:width-1]
+            tiles += model.tiles[-width:]
+            model.tiles[:] = tiles
+            items = [(row, col, ITEM_TYPES[item_type]) for row, col, item_type in ITEM.iter_unpack(data[offset:offset+item_count*ITEM.size])]
+    exit_pos = None
+    if flags & HAS_EXIT:
+        exit_pos = (exit_row, exit_col)
+        model.make_exit(exit_row, exit_col)
+    if not flags & HAS_SEED:
+        seed = None
+    return model, exit_pos, items, seed
+
+## CLASSES
+# A directory of saved mazes, one file for each seed and set of settings used
+# to make them, so a maze that was made before is just loaded.
+class MazeCache():
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, seed, vertical_cells, horizontal_cells, algorithm, loop_chance, item_chance):
+        name = "%d_%dx%d_%s_%r_%r.maze" % (seed, vertical_cells, horizontal_cells, algorithm, loop_chance, item_chance)
+        return os.path.join(self.directory, name)
+
+    # Returns the same as load_maze(), or None if the maze isn't saved.
+    def load(self, seed, vertical_cells, horizontal_cells, algorithm, loop_chance, item_chance):
+        path = self.get_path(seed, vertical_cells, horizontal_cells, algorithm, loop_chance, item_chance)
+        if not os.path.exists(path):
+            return None
+        return load_maze(path)
+
+    def save(self, model, exit_pos, items, seed, algorithm, loop_chance, item_chance):
+        path = self.get_path(seed, model.MAX_VER_TILES//2, model.MAX_HOR_TILES//2, algorithm, loop_chance, item_chance)
+        save_maze(path, model, exit_pos, items, seed)
@@ -0,0 +1,379 @@
+from array import array
+import random
+from random import Random
+from time import perf_counter
+from maze_model import MazeModel, TYPE_MASK, WALL, PASSAGE, SPECIAL
+from maze_analysis import analyse
+
+## MAZE GENERATORS
+# Every generator carves a fresh MazeModel into a maze, starting from the cell
+# at (row, col) if the algorithm has a starting point, and takes the same
+# loop_chance as the recursive backtracker, and an rng, a random.Random, that
+# every random number comes from, so the same seed gives the same maze every
+# time, whatever else is using random numbers meanwhile. Without an rng they
+# use the random module, which has the same functions.
+# All of them work on indexes into the model's bytearray. Cells are on odd
+# rows and columns, and the wall between two cells is at the index halfway
+# between them.
+# Walls that are carved had the type WALL, which is 0, so carving is just
+# setting the PASSAGE bit.
+# Some generators can also carve a step at a time, as a Python generator that
+# yields after each wall it carves. Steps can be run a few at a time, between
+# frames, and the maze comes out the same as carving it all at once.
+
+# The rng a generator was given, or the random module if it wasn't.
+def get_rng(rng):
+    if rng == None:
+        return random
+    return rng
+
+# Returns the indexes of every wall between two cells, row by row.
+def get_inner_walls(model):
+    width = model.MAX_HOR_TILES
+    walls = []
+    for row in range(1, model.MAX_VER_TILES-1):
+        if row % 2 == 1:
+            # Walls between cells side by side.
+            walls.extend(range(row*width+2, row*width+width-2, 2))
+        else:
+            # Walls between cells above each other.
+            walls.extend(range(row*width+1, row*width+width-1, 2))
+    return walls
+
+# The algorithms below all make perfect mazes, with exactly one path between
+# any two cells. Loops are added afterwards by opening each wall still
+# standing between two cells with a chance of loop_chance.
+def add_loops(model, loop_chance, rng=None):
+    if loop_chance <= 0:
+        return
+    rng = get_rng(rng)
+    tiles = model.tiles
+    for wall in get_inner_walls(model):
+        if tiles[wall] & TYPE_MASK == WALL and rng.random() <= loop_chance:
+            tiles[wall] |= PASSAGE
+
+# Returns the indexes of the cells next to a cell, in the order north, east,
+# south, west. The wall between two cells is never special, and the border
+# always is, so a neighbour only has to be checked through its wall.
+def get_neighbour_cells(model, i):
+    tiles = model.tiles
+    width = model.MAX_HOR_TILES
+    return [i + 2*step for step in (-width, 1, width, -1) if not tiles[i+step] & SPECIAL]
+
+def recursive_backtracker(model, row, col, loop_chance, rng=None):
+    model.recursive_backtracker(row, col, loop_chance, rng)
+
+def recursive_backtracker_steps(model, row, col, loop_chance, rng=None):
+    return model.backtracker_steps(row, col, loop_chance, rng)
+
+# Kruskal's algorithm: the walls are gone through in a random order, and a
+# wall is carved if the cells on either side aren't joined yet. Which cells
+# are joined is kept in a union-find over the tile indexes, with path halving
+# and union by size, so each check takes close to constant time.
+def kruskal(model, row, col, loop_chance, rng=None):
+    rng = get_rng(rng)
+    tiles = model.tiles
+    width = model.MAX_HOR_TILES
+    parents = array('i', range(len(tiles)))
+    sizes = array('i', [1])*len(tiles)
+    walls = get_inner_walls(model)
+    rng.shuffle(walls)
+    joins_left = (model.MAX_VER_TILES//2)*(model.MAX_HOR_TILES//2) - 1
+    for wall in walls:
+        if (wall // width) % 2 == 1:
+            a = wall-1
+            b = wall+1
+        else:
+            a = wall-width
+            b = wall+width
+        while parents[a] != a:
+            parents[a] = parents[parents[a]]
+            a = parents[a]
+        while parents[b] != b:
+            parents[b] = parents[parents[b]]
+            b = parents[b]
+        if a == b:
+            continue
+        if sizes[a] < sizes[b]:
+            a, b = b, a
+        parents[b] = a
+        sizes[a] += sizes[b]
+        tiles[wall] |= PASSAGE
+        joins_left -= 1
+        if joins_left == 0:
+            break
+    add_loops(model, loop_chance, rng)
+
+# Prim's algorithm, growing the maze from the starting cell. A random cell
+# next to the maze is added each time, joined to a random cell of the maze
+# next to it.
+def prim(model, row, col, loop_chance, rng=None):
+    rng = get_rng(rng)
+    tiles = model.tiles
+    width = model.MAX_HOR_TILES
+    steps = (-width, 1, width, -1)
+    # 0 for cells not reached yet, 1 for cells next to the maze, 2 for cells
+    # in the maze.
+    states = bytearray(len(tiles))
+    start = model.index(row, col)
+    states[start] = 2
+    frontier = []
+    for neighbour in get_neighbour_cells(model, start):
+        states[neighbour] = 1
+        frontier.append(neighbour)
+    while len(frontier) != 0:
+        # Swaps the chosen cell to the end, so it can be removed in constant
+        # time.
+        position = rng.randrange(len(frontier))
+        frontier[position], frontier[-1] = frontier[-1], frontier[position]
+        cell = frontier.pop()
+        in_maze = []
+        for step in steps:
+            if tiles[cell+step] & SPECIAL:
+                continue
+            neighbour = cell + 2*step
+            if states[neighbour] == 2:
+                in_maze.append(neighbour)
+            elif states[neighbour] == 0:
+                states[neighbour] = 1
+                frontier.append(neighbour)
+        joined = in_maze[rng.randrange(len(in_maze))]
+        tiles[(cell + joined) // 2] |= PASSAGE
+        states[cell] = 2
+    add_loops(model, loop_chance, rng)
+
+# The growing tree algorithm. Cells that still have unvisited neighbours are
+# kept in a list, and each step carves from one of them to a random unvisited
+# neighbour. With a chance of newest_chance the newest cell in the list is
+# used, which gives long corridors like the backtracker, and otherwise a
+# random one, which gives short branches like Prim's. Finished cells are
+# swapped with the last cell before being removed, so removing is constant
+# time, at the cost of the order not being quite the order cells were added.
+def growing_tree(model, row, col, loop_chance, rng=None, newest_chance=0.5):
+    rng = get_rng(rng)
+    tiles = model.tiles
+    width = model.MAX_HOR_TILES
+    steps = (-width, 1, width, -1)
+    visited = bytearray(len(tiles))
+    start = model.index(row, col)
+    visited[start] = 1
+    active = [start]
+    while len(active) != 0:
+        if rng.random() < newest_chance:
+            position = len(active)-1
+        else:
+            position = rng.randrange(len(active))
+        cell = active[position]
+        unvisited = []
+        for step in steps:
+            if not tiles[cell+step] & SPECIAL and not visited[cell+2*step]:
+                unvisited.append(cell+2*step)
+        if len(unvisited) == 0:
+            active[position] = active[-1]
+            active.pop()
+            continue
+        next_cell = unvisited[rng.randrange(len(unvisited))]
+        tiles[(cell + next_cell) // 2] |= PASSAGE
+        visited[next_cell] = 1
+        active.append(next_cell)
+    add_loops(model, loop_chance, rng)
+
+# Returns a growing tree generator that always uses the given newest_chance,
+# so it can be put in the registry.
+def make_growing_tree(newest_chance):
+    def generator(model, row, col, loop_chance, rng=None):
+        growing_tree(model, row, col, loop_chance, rng, newest_chance)
+    return generator
+
+# Wilson's algorithm, which picks uniformly from every possible maze. Starting
+# from each cell not yet in the maze, a random walk is taken until it reaches
+# the maze, remembering the last way it left each cell. Following those ways
+# from the start gives the walk with its loops taken out, which is carved
+# into the maze.
+def wilson(model, row, col, loop_chance, rng=None):
+    rng = get_rng(rng)
+    tiles = model.tiles
+    width = model.MAX_HOR_TILES
+    height = model.MAX_VER_TILES
+    in_maze = bytearray(len(tiles))
+    # The cell each cell was last left towards during the current walk.
+    next_cells = array('i', bytes(4*len(tiles)))
+    in_maze[model.index(row, col)] = 1
+    steps = (-width, 1, width, -1)
+    for start_row in range(1, height-1, 2):
+        for start in range(start_row*width+1, start_row*width+width-1, 2):
+            if in_maze[start]:
+                continue
+            # The random walk. Moves into the border are just tried again.
+            cell = start
+            while not in_maze[cell]:
+                step = steps[int(rng.random()*4)]
+                if tiles[cell+step] & SPECIAL:
+                    continue
+                neighbour = cell + 2*step
+                next_cells[cell] = neighbour
+                cell = neighbour
+            # Carving along the walk with the loops taken out.
+            cell = start
+            while not in_maze[cell]:
+                in_maze[cell] = 1
+                neighbour = next_cells[cell]
+                tiles[(cell + neighbour) // 2] |= PASSAGE
+                cell = neighbour
+    add_loops(model, loop_chance, rng)
+
+# Works out one row of cells at a time for Eller's algorithm, using only as
+# much memory as a row. Every cell belongs to a set of cells that are already
+# joined. Neighbours in different sets are joined at random, and then every
+# set carves down at least once, so no set is ever cut off.
+class EllerRows():
+    def __init__(self, cells, rng=None):
+        self.rng = get_rng(rng)
+        self.cells = cells
+        # The set each cell of the current row is in, or -1 if it hasn't been
+        # given one.
+        self.sets = [-1]*cells
+        self.next_set = 0
+
+    # Returns which walls of the next row are carved, as two lists: whether
+    # each cell joins the cell to its east, and whether each cell joins the
+    # cell below. On the last row every set is joined together, so nothing
+    # carves down.
+    def next_row(self, last=False):
+        cells = self.cells
+        sets = self.sets
+        for col in range(cells):
+            if sets[col] == -1:
+                sets[col] = self.next_set
+                self.next_set += 1
+        # Sets that get merged point at the set they were merged into, and are
+        # looked up at the end of the row.
+        merged = {}
+        def find(label):
+            root = label
+            while root in merged:
+                root = merged[root]
+            while label != root:
+                merged[label], label = root, merged[label]
+            return root
+        east = [False]*(cells-1)
+        for col in range(cells-1):
+            a = find(sets[col])
+            b = find(sets[col+1])
+            if a != b and (last or self.rng.random() < 0.5):
+                east[col] = True
+                merged[b] = a
+        for col in range(cells):
+            sets[col] = find(sets[col])
+        south = [False]*cells
+        if not last:
+            members = {}
+            for col in range(cells):
+                members.setdefault(sets[col], []).append(col)
+            for columns in members.values():
+                carved = False
+                for col in columns:
+                    if self.rng.random() < 0.5:
+                        south[col] = True
+                        carved = True
+                if not carved:
+                    south[columns[self.rng.randrange(len(columns))]] = True
+            for col in range(cells):
+                if not south[col]:
+                    sets[col] = -1
+        return east, south
+
+# Eller's algorithm, carving the maze a row at a time from the top.
+def eller(model, row, col, loop_chance, rng=None):
+    tiles = model.tiles
+    width = model.MAX_HOR_TILES
+    cell_rows = model.MAX_VER_TILES//2
+    rows = EllerRows(width//2, rng)
+    for cell_row in range(cell_rows):
+        east, south = rows.next_row(cell_row == cell_rows-1)
+        first = (2*cell_row+1)*width + 1
+        for position in range(len(east)):
+            if east[position]:
+                tiles[first + 2*position + 1] |= PASSAGE
+        for position in range(len(south)):
+            if south[position]:
+                tiles[first + 2*position + width] |= PASSAGE
+    add_loops(model, loop_chance, rng)
+
+# Every generator by name.
+GENERATORS = {"backtracker": recursive_backtracker,
+              "kruskal": kruskal,
+              "prim": prim,
+              "growing_tree": growing_tree,
+              "wilson": wilson,
+              "eller": eller}
+
+# Generators that can carve a step at a time, by the same names.
+STEP_GENERATORS = {"backtracker": recursive_backtracker_steps}
+
+# Adds a generator to the registry, or replaces one with the same name. steps
+# is its step at a time version, if it has one. Both are called with
+# (model, row, col, loop_chance, rng), and rng may be None.
+def register(name, generator, steps=None):
+    GENERATORS[name] = generator
+    STEP_GENERATORS.pop(name, None)
+    if steps != None:
+        STEP_GENERATORS[name] = steps
+
+# Carves a maze with the named generator, taking its random numbers from rng
+# if given.
+def generate(model, algorithm, row, col, loop_chance, rng=None):
+    GENERATORS[algorithm](model, row, col, loop_chance, rng)
+
+# Same as generate(), a step at a time. A generator without a step at a time
+# version carves the whole maze in one step.
+def generate_steps(model, algorithm, row, col, loop_chance, rng=None):
+    if algorithm in STEP_GENERATORS:
+        yield from STEP_GENERATORS[algorithm](model, row, col, loop_chance, rng)
+    else:
+        generate(model, algorithm, row, col, loop_chance, rng)
+        yield
+
+# Runs steps to the end, and returns what the generator returns.
+def finish(steps):
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+# Runs steps until there are none left or the time, in seconds, is up, so
+# carving can be given a share of every frame. Returns True once there are
+# none left.
+def run_for(steps, seconds):
+    end_time = perf_counter() + seconds
+    for step in steps:
+        if perf_counter() >= end_time:
+            return False
+    return True
+
+# Makes the maze, items and exit that a World given maze_seed makes, and
+# returns the model, the exit and the items as (row, col, type). A new
+# MazeModel of the right size can be given to carve into, so it can be
+# watched while it's carved.
+def generate_seeded(maze_seed, rows, cols, algorithm, loop_chance, item_chance, model=None):
+    return finish(generate_seeded_steps(maze_seed, rows, cols, algorithm, loop_chance, item_chance, model))
+
+# Same as generate_seeded(), a step at a time. Every random number comes from
+# a random.Random of the maze's own, so any number of mazes can be made at
+# once, on any threads.
+def generate_seeded_steps(maze_seed, rows, cols, algorithm, loop_chance, item_chance, model=None):
+    rng = Random(maze_seed)
+    if model == None:
+        model = MazeModel(rows, cols)
+    yield from generate_steps(model, algorithm, *model.get_random_cell(rng), loop_chance, rng)
+    items = model.choose_items(item_chance, dead_ends=analyse(model).get_dead_end_cells(), rng=rng)
+    exit_pos = model.get_exit_wall(rng)
+    model.make_exit(*exit_pos)
+    return model, exit_pos, items
+
+# Returns the random.Random a seeded game is played with once its maze is made
+# or loaded, such as to pick where the player starts, so that is the same
+# however the maze got there.
+def play_rng(maze_seed):
+    return Random("play %d" % maze_seed)
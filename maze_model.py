@@ -0,0 +1,227 @@
+from random import choice, random, randrange
+
+## TILE BYTES
+# Every tile of the maze is stored as a single byte. The two lowest bits hold
+# the tile type and the rest are flags that can be switched on and off.
+WALL = 0
+CELL = 1
+PASSAGE = 2
+TYPE_MASK = 3
+
+# Walls on even rows and columns and around the border can never be broken.
+SPECIAL = 4
+EXIT = 8
+# Set once the player has walked over a cell or passage.
+PAINTED = 16
+# Only used while the maze is being generated.
+VISITED = 32
+
+# Is a tile byte one that can be walked on, as 0 or 1. Whole rows of tiles
+# can be turned into this with bytes.translate().
+OPEN_TABLE = bytes(0 if tile & TYPE_MASK == WALL else 1 for tile in range(256))
+
+## CLASSES
+# The maze without anything needed to draw or play it. The tiles are kept in a
+# flat bytearray, row after row, so a tile takes up one byte instead of a whole
+# sprite. Nothing in here needs pygame, so the text prototype and any tools can
+# use it as well.
+class MazeModel():
+    def __init__(self, vertical_cells, horizontal_cells):
+        self.MAX_VER_TILES = vertical_cells*2+1
+        self.MAX_HOR_TILES = horizontal_cells*2+1
+        # Rows are built as whole byte strings, since even and odd rows always
+        # look the same before the maze is carved.
+        border_row = bytes([SPECIAL])*self.MAX_HOR_TILES
+        cell_row = bytes([SPECIAL]) + bytes([CELL, WALL])*(horizontal_cells-1) + bytes([CELL, SPECIAL])
+        wall_row = bytes([SPECIAL, WALL])*horizontal_cells + bytes([SPECIAL])
+        self.tiles = bytearray(border_row + (cell_row+wall_row)*(vertical_cells-1) + cell_row + border_row)
+
+    # Returns the position of a tile in the bytearray.
+    def index(self, row, col):
+        return row*self.MAX_HOR_TILES + col
+
+    def in_bounds(self, row, col):
+        return 0 <= row < self.MAX_VER_TILES and 0 <= col < self.MAX_HOR_TILES
+
+    def get_type(self, row, col):
+        return self.tiles[row*self.MAX_HOR_TILES + col] & TYPE_MASK
+
+    # Changes the type of a tile, keeping its flags.
+    def set_type(self, row, col, tile_type):
+        i = row*self.MAX_HOR_TILES + col
+        self.tiles[i] = (self.tiles[i] & ~TYPE_MASK) | tile_type
+
+    def is_wall(self, row, col):
+        return self.tiles[row*self.MAX_HOR_TILES + col] & TYPE_MASK == WALL
+
+    # Same as not is_wall(), by index into the bytearray.
+    def is_open(self, i):
+        return self.tiles[i] & TYPE_MASK != WALL
+
+    # North, east, south, west, as steps through the bytearray.
+    @property
+    def steps(self):
+        return (-self.MAX_HOR_TILES, 1, self.MAX_HOR_TILES, -1)
+
+    def is_special(self, row, col):
+        return self.tiles[row*self.MAX_HOR_TILES + col] & SPECIAL != 0
+
+    def is_exit(self, row, col):
+        return self.tiles[row*self.MAX_HOR_TILES + col] & EXIT != 0
+
+    def is_painted(self, row, col):
+        return self.tiles[row*self.MAX_HOR_TILES + col] & PAINTED != 0
+
+    def is_visited(self, row, col):
+        return self.tiles[row*self.MAX_HOR_TILES + col] & VISITED != 0
+
+    def make_exit(self, row, col):
+        self.tiles[row*self.MAX_HOR_TILES + col] |= EXIT
+
+    # Paints a tile. Returns True only if it wasn't painted before.
+    def paint(self, row, col):
+        i = row*self.MAX_HOR_TILES + col
+        if self.tiles[i] & PAINTED:
+            return False
+        self.tiles[i] |= PAINTED
+        return True
+
+    # Changes a wall between two cells to a passage.
+    def carve_passage(self, row1, col1, row2, col2):
+        self.set_type((row1 + row2) // 2, (col1 + col2) // 2, PASSAGE)
+
+    # Same algorithm as Grid.recursive_backtracker, working on indexes into the
+    # bytearray. The random numbers are used in the same order, so for the same
+    # random state both give the same maze.
+    # The random module is used unless an rng of its own, a random.Random, is
+    # given, so a maze can be made again from just its seed.
+    def recursive_backtracker(self, row, col, loop_chance, rng=None):
+        for wall in self.backtracker_steps(row, col, loop_chance, rng):
+            pass
+
+    # Same as recursive_backtracker(), one step at a time: the index of each
+    # wall is yielded as soon as it is carved. The maze is the same however
+    # far apart the steps are run, so it can be carved a few steps a frame,
+    # and drawn between them.
+    def backtracker_steps(self, row, col, loop_chance, rng=None):
+        pick = choice if rng == None else rng.choice
+        chance = random if rng == None else rng.random
+        tiles = self.tiles
+        width = self.MAX_HOR_TILES
+        size = len(tiles)
+        start = row*width + col
+        stack = [(start, self.__unvisited_neighbours(start))]
+        tiles[start] |= VISITED
+        while len(stack) != 0:
+            cell, neighbours = stack[-1]
+            if len(neighbours) == 0:
+                stack.pop()
+                continue
+            next_cell = pick(neighbours)
+            neighbours.remove(next_cell)
+            if not tiles[next_cell] & VISITED:
+                wall = (cell + next_cell) // 2
+                tiles[wall] = (tiles[wall] & ~TYPE_MASK) | PASSAGE
+                yield wall
+            elif chance() <= loop_chance:
+                wall = (cell + next_cell) // 2
+                tiles[wall] = (tiles[wall] & ~TYPE_MASK) | PASSAGE
+                yield wall
+            stack.append((next_cell, self.__unvisited_neighbours(next_cell)))
+            tiles[next_cell] |= VISITED
+
+    # Returns the indexes of the unvisited cells next to a cell, in the order
+    # north, east, south, west.
+    def __unvisited_neighbours(self, i):
+        tiles = self.tiles
+        width = self.MAX_HOR_TILES
+        col = i % width
+        neighbours = []
+        if i >= 3*width and not tiles[i - 2*width] & VISITED:
+            neighbours.append(i - 2*width)
+        if col+2 < width and not tiles[i + 2] & VISITED:
+            neighbours.append(i + 2)
+        if i + 2*width < len(tiles) and not tiles[i + 2*width] & VISITED:
+            neighbours.append(i + 2*width)
+        if col-2 > 0 and not tiles[i - 2] & VISITED:
+            neighbours.append(i - 2)
+        return neighbours
+
+    # Returns the grid in a textual form, a line for each row.
+    def get_text(self):
+        width = self.MAX_HOR_TILES
+        lines = []
+        for row in range(self.MAX_VER_TILES):
+            line = self.tiles[row*width:(row+1)*width]
+            lines.append("".join("H " if tile & TYPE_MASK == WALL else "  " for tile in line))
+        return "\n".join(lines)
+
+    # Displays the grid in a textual form.
+    def print_grid(self):
+        width = self.MAX_HOR_TILES
+        for row in range(self.MAX_VER_TILES):
+            print()
+            line = self.tiles[row*width:(row+1)*width]
+            print("".join("H " if tile & TYPE_MASK == WALL else "  " for tile in line), end='')
+
+    def get_random_cell(self, rng=None):
+        pick = randrange if rng == None else rng.randrange
+        # Numbers are always odd since cells reside only on odd-numbered rows
+        # and columns.
+        random_row = pick(1, self.MAX_VER_TILES-2, 2)
+        random_col = pick(1, self.MAX_HOR_TILES-2, 2)
+        return random_row, random_col
+
+    def is_dead_end(self, row, col):
+        walls = 0
+        if self.is_wall(row+1, col):
+            walls += 1
+        if self.is_wall(row-1, col):
+            walls += 1
+        if self.is_wall(row, col+1):
+            walls += 1
+        if self.is_wall(row, col-1):
+            walls += 1
+        return walls == 3
+
+    # Returns the row and column of every dead end in the given rows of
+    # cells, or all of them, row by row.
+    def get_dead_end_cells(self, rows=None):
+        if rows == None:
+            rows = range(1, self.MAX_VER_TILES, 2)
+        return [(row, col) for row in rows for col in range(1, self.MAX_HOR_TILES, 2) if self.is_dead_end(row, col)]
+
+    # Picks which dead ends get items, going through the given rows of cells,
+    # or all of them, one row at a time. Returns them as (row, col, type).
+    # The dead ends can be given if they are already known, in the same order.
+    # The random module is used unless an rng is given.
+    def choose_items(self, chance, rows=None, dead_ends=None, rng=None):
+        roll = random if rng == None else rng.random
+        if dead_ends == None:
+            dead_ends = self.get_dead_end_cells(rows)
+        items = []
+        for row, col in dead_ends:
+            if roll() <= chance:
+                if roll() < 0.5:
+                    items.append((row, col, "BREAK"))
+                else:
+                    items.append((row, col, "JUMP"))
+        return items
+
+    # Picks one of the odd-numbered outside walls. They are listed row by row,
+    # left to right, so the choice is the same as picking from every tile.
+    def get_exit_wall(self, rng=None):
+        pick = choice if rng == None else rng.choice
+        last_row = self.MAX_VER_TILES-1
+        last_col = self.MAX_HOR_TILES-1
+        available_walls = [(0, col) for col in range(1, last_col, 2)]
+        for row in range(1, last_row, 2):
+            available_walls.append((row, 0))
+            available_walls.append((row, last_col))
+        available_walls += [(last_row, col) for col in range(1, last_col, 2)]
+        return pick(available_walls)
+
+    def get_cell_near_exit(self, row, col):
+        for near_row, near_col in ((row-1, col), (row+1, col), (row, col-1), (row, col+1)):
+            if self.in_bounds(near_row, near_col) and self.get_type(near_row, near_col) == CELL:
+                return near_row, near_col
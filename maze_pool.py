@@ -0,0 +1,140 @@
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+from threading import RLock
+from maze_generators import finish, generate_seeded_steps, play_rng
+from maze_model import MazeModel
+from maze_analysis import analyse
+
+# Mazes tried one after another when take() finds nothing ready, before the
+# last one is handed over whether it fits or not.
+MAX_TRIES = 20
+
+## FUNCTIONS
+# Returns how hard a maze is to play, from where the player starts: the steps
+# to the exit, in widths of the maze, so mazes of any size can be held to the
+# same numbers, and the share of cells that are dead ends. The enemy starts on
+# the cell in front of the exit, so how far away it starts is the same number
+# less a tile, and isn't scored on its own.
+def score_maze(model, exit_pos, spawn):
+    width = model.MAX_HOR_TILES
+    analysis = analyse(model)
+    cells = (model.MAX_VER_TILES//2)*(width//2)
+    return {"exit_distance": analysis.get_exit_distance(spawn, exit_pos)/width,
+            "dead_end_ratio": len(analysis.get_dead_end_cells())/cells}
+
+# Makes the maze a World given maze_seed makes, with the player on the same
+# cell, and scores it. Returns (maze_seed, model, exit_pos, items, scores).
+# The maze is carved into model if one is given, as with generate_seeded().
+def make_candidate(task, model=None):
+    return finish(candidate_steps(task, model))
+
+# Same as make_candidate(), a step at a time.
+def candidate_steps(task, model=None):
+    maze_seed, cells, loop_chance, item_chance, algorithm = task
+    model, exit_pos, items = yield from generate_seeded_steps(maze_seed, cells, cells, algorithm, loop_chance, item_chance, model)
+    spawn = model.get_random_cell(play_rng(maze_seed))
+    return maze_seed, model, exit_pos, items, score_maze(model, exit_pos, spawn)
+
+# Is a maze's score within a target of (fewest and most exit widths, fewest
+# and most dead ends per cell).
+def fits_target(scores, target):
+    min_exit, max_exit, min_dead_ends, max_dead_ends = target
+    return (min_exit <= scores["exit_distance"] <= max_exit
+            and min_dead_ends <= scores["dead_end_ratio"] <= max_dead_ends)
+
+## CLASSES
+# Mazes made ahead of time for each preset, on a pool of processes, so one
+# is ready the moment it's asked for. Mazes are made from random seeds and
+# scored, and only the ones that fit their preset's target are kept, so every
+# game of a preset is about as hard as the others, where mazes straight from
+# the generator swing from an exit next to the player to one three widths of
+# the maze away.
+# The pool is filled in the background: whenever a maze is done it is kept or
+# thrown away and another is started, until every preset has size mazes kept.
+# Taking one starts another. Each kept maze is the one a World given its seed
+# makes, so a game from the pool can be played again just from its seed.
+# Presets are given by name as (cells per side, loop chance, item chance,
+# maze generator), and targets by the same names, as taken by fits_target().
+class MazePool():
+    def __init__(self, presets, targets, size=2, workers=1):
+        self.presets = presets
+        self.targets = targets
+        self.size = size
+        # Seeds are only used to make mazes, so they come from their own
+        # generator, and the random module is left alone.
+        self.seeds = Random()
+        # The lock is taken again when a maze finishes straight away, so it
+        # has to be reentrant.
+        self.lock = RLock()
+        self.ready = {name: [] for name in presets}
+        self.pending = {name: 0 for name in presets}
+        self.closed = False
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        with self.lock:
+            for name in presets:
+                self.fill(name)
+
+    def get_task(self, name):
+        cells, loop_chance, item_chance, algorithm = self.presets[name]
+        return self.seeds.getrandbits(32), cells, loop_chance, item_chance, algorithm
+
+    # Starts making enough mazes for a preset to have size of them, counting
+    # the ones being made. Called with the lock held.
+    def fill(self, name):
+        while not self.closed and len(self.ready[name]) + self.pending[name] < self.size:
+            try:
+                future = self.executor.submit(make_candidate, self.get_task(name))
+            except RuntimeError:
+                # The interpreter is exiting without close() being called.
+                self.closed = True
+                return
+            self.pending[name] += 1
+            future.add_done_callback(lambda future, name=name: self.candidate_done(name, future))
+
+    # Runs on the pool's thread whenever a maze is done. A maze that failed
+    # isn't made again, so a broken pool can't spin, and take() makes its own.
+    def candidate_done(self, name, future):
+        with self.lock:
+            self.pending[name] -= 1
+            if future.cancelled() or future.exception() != None:
+                return
+            maze_seed, model, exit_pos, items, scores = future.result()
+            if fits_target(scores, self.targets[name]):
+                self.ready[name].append((maze_seed, model, exit_pos, items))
+            self.fill(name)
+
+    def count_ready(self, name):
+        with self.lock:
+            return len(self.ready[name])
+
+    # Returns (maze_seed, model, exit_pos, items) of a maze for a preset that
+    # fits its target. If none are ready yet, mazes are made here until one
+    # fits, or MAX_TRIES have been made.
+    def take(self, name):
+        return finish(self.take_steps(name))
+
+    # Same as take(), a step at a time, so a maze that has to be made here
+    # can be carved a few steps a frame, or stopped part way. Each maze made
+    # here is handed to watch, if given, before it is carved.
+    def take_steps(self, name, watch=None):
+        with self.lock:
+            if self.ready[name]:
+                entry = self.ready[name].pop(0)
+                self.fill(name)
+                return entry
+            tasks = [self.get_task(name) for attempt in range(MAX_TRIES)]
+        cells = self.presets[name][0]
+        for task in tasks:
+            model = MazeModel(cells, cells)
+            if watch != None:
+                watch(model)
+            maze_seed, model, exit_pos, items, scores = yield from candidate_steps(task, model)
+            if fits_target(scores, self.targets[name]):
+                break
+        return maze_seed, model, exit_pos, items
+
+    # Stops the processes. Mazes not started yet are dropped.
+    def close(self):
+        with self.lock:
+            self.closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
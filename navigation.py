@@ -0,0 +1,153 @@
+from array import array
+from collections import deque
+from maze_model import TYPE_MASK, WALL, OPEN_TABLE
+
+## CLASSES
+# How far every tile is from a target tile, found with a breadth first search.
+# Anything chasing the target just steps onto a neighbouring tile that is one
+# step closer, so one field serves any number of chasers.
+# The search is lazy: it only goes as far out as the tiles that have been asked
+# about, and carries on from where it stopped when a further tile is asked
+# about. Each distance is stored with the number of the search that found it,
+# so the old distances are thrown away in constant time.
+# Moving the target is a whole new search, not an update of the old one: when
+# the target moves one tile, every other tile gets one step nearer or further
+# in a maze without loops, so there is nothing to keep. The search is only as
+# big as it needs to be, though, so it costs as many tiles as are closer to
+# the target than the furthest tile asked about.
+class DistanceField():
+    def __init__(self, model):
+        self.model = model
+        size = len(model.tiles)
+        self.distances = array('i', bytes(4*size))
+        self.searches = array('I', bytes(4*size))
+        self.search = 0
+        self.target = None
+        self.queue = deque()
+        self.steps = model.steps
+        # Which tiles could be walked on the last time they were looked at, so
+        # a change to a tile's flags, such as painting it, can be told apart
+        # from a wall being broken.
+        self.open = model.tiles.translate(OPEN_TABLE)
+
+    # Moves the target. Nothing is searched until a distance is asked for, and
+    # nothing happens at all if the target is on the same tile as before.
+    def set_target(self, row, col):
+        i = self.model.index(row, col)
+        if i != self.target:
+            self.__restart(i)
+
+    # Used as a listener for Grid.tile_changed. Only a tile that was opened or
+    # closed changes any distances. Distances can only get shorter when a wall
+    # is opened, so once the search is finished only the tiles that get closer
+    # are changed, going out from the opened tile. Anything else starts the
+    # search over, unless it is somewhere the search hasn't got to yet, where
+    # it will be seen when the search gets there.
+    def tile_changed(self, row, col):
+        i = self.model.index(row, col)
+        is_open = OPEN_TABLE[self.model.tiles[i]]
+        if is_open == self.open[i]:
+            return
+        self.open[i] = is_open
+        if self.target == None:
+            return
+        finished = len(self.queue) == 0
+        reached = [n for n in self.__neighbours(i) if self.searches[n] == self.search]
+        if is_open and len(reached) == 0:
+            return
+        if not is_open and self.searches[i] != self.search:
+            return
+        if is_open and finished:
+            self.__repair(i, min(self.distances[n] for n in reached) + 1)
+        else:
+            self.__restart(self.target)
+
+    # Must be called when rows are dropped from the top of the model. Every
+    # tile has moved, so the field is started again with the target moved up
+    # with them, if it wasn't dropped.
+    def rows_removed(self, rows):
+        self.open = self.model.tiles.translate(OPEN_TABLE)
+        if self.target != None:
+            target = self.target - rows*self.model.MAX_HOR_TILES
+            if target >= 0:
+                self.__restart(target)
+            else:
+                self.search += 1
+                self.target = None
+                self.queue = deque()
+
+    def __neighbours(self, i):
+        return [i + step for step in self.steps if 0 <= i + step < len(self.open)]
+
+    # Gives an opened tile its distance, and passes it on to every tile that
+    # gets closer through it. Distances only ever go down here, so each tile
+    # is changed at most once.
+    def __repair(self, i, distance):
+        tiles = self.model.tiles
+        distances = self.distances
+        searches = self.searches
+        search = self.search
+        steps = self.steps
+        distances[i] = distance
+        searches[i] = search
+        queue = deque([i])
+        while len(queue) != 0:
+            current = queue.popleft()
+            distance = distances[current] + 1
+            for step in steps:
+                neighbour = current + step
+                if tiles[neighbour] & TYPE_MASK != WALL and (searches[neighbour] != search or distances[neighbour] > distance):
+                    searches[neighbour] = search
+                    distances[neighbour] = distance
+                    queue.append(neighbour)
+
+    def __restart(self, i):
+        self.search += 1
+        self.target = i
+        self.distances[i] = 0
+        self.searches[i] = self.search
+        self.queue = deque([i])
+
+    # Carries on with the search until tile i has a distance or every tile
+    # that can be reached has one.
+    def __search_until(self, i):
+        tiles = self.model.tiles
+        distances = self.distances
+        searches = self.searches
+        search = self.search
+        queue = self.queue
+        steps = self.steps
+        while searches[i] != search and len(queue) != 0:
+            current = queue.popleft()
+            distance = distances[current] + 1
+            # Open tiles are never on the border, so their neighbours are
+            # always inside the grid.
+            for step in steps:
+                neighbour = current + step
+                if searches[neighbour] != search and tiles[neighbour] & TYPE_MASK != WALL:
+                    searches[neighbour] = search
+                    distances[neighbour] = distance
+                    queue.append(neighbour)
+
+    # Returns how many steps a tile is from the target, or None if it can't be
+    # reached.
+    def get_distance(self, row, col):
+        i = self.model.index(row, col)
+        self.__search_until(i)
+        if self.searches[i] != self.search:
+            return None
+        return self.distances[i]
+
+    # Returns the row and column of a neighbouring tile that is one step closer
+    # to the target. Returns None if the tile is the target or can't reach it.
+    def next_step(self, row, col):
+        distance = self.get_distance(row, col)
+        if distance == None or distance == 0:
+            return None
+        # Every tile one step closer was found before this one, so their
+        # distances are already known.
+        i = self.model.index(row, col)
+        for step in self.steps:
+            neighbour = i + step
+            if self.searches[neighbour] == self.search and self.distances[neighbour] == distance-1:
+                return divmod(neighbour, self.model.MAX_HOR_TILES)
@@ -0,0 +1,257 @@
+from array import array
+from heapq import heappush, heappop
+from maze_model import TYPE_MASK, WALL
+
+## CLASSES
+# Finds shortest paths between two tiles of a MazeModel. All three searches
+# work straight on the model's bytearray and return a list of (row, col)
+# positions from the start to the goal, or an empty list if there is no path.
+# The arrays used during a search are made once and reused by every search.
+# Instead of clearing them, each search has its own number, and an entry only
+# counts if it was written with the current number.
+class PathFinder():
+    def __init__(self, model):
+        self.model = model
+        size = len(model.tiles)
+        self.width = model.MAX_HOR_TILES
+        self.steps = model.steps
+        self.search = 0
+        # Used by every search, and for the forwards half of the bidirectional
+        # search.
+        self.parents = array('i', bytes(4*size))
+        self.costs = array('i', bytes(4*size))
+        self.seen = array('I', bytes(4*size))
+        self.closed = array('I', bytes(4*size))
+        # Only used for the backwards half of the bidirectional search.
+        self.back_parents = array('i', bytes(4*size))
+        self.back_seen = array('I', bytes(4*size))
+
+    # Manhattan distance between two indexes.
+    def __heuristic(self, i, goal):
+        row1, col1 = divmod(i, self.width)
+        row2, col2 = divmod(goal, self.width)
+        return abs(row1-row2) + abs(col1-col2)
+
+    # Follows the parents back from the goal and returns the path as rows and
+    # columns, start first.
+    def __build_path(self, start, goal, parents):
+        path = [divmod(goal, self.width)]
+        i = goal
+        while i != start:
+            i = parents[i]
+            path.append(divmod(i, self.width))
+        path.reverse()
+        return path
+
+    # Checks both tiles and returns their indexes, or None if either is a wall.
+    def __get_ends(self, start, goal):
+        start = self.model.index(*start)
+        goal = self.model.index(*goal)
+        if not self.model.is_open(start) or not self.model.is_open(goal):
+            return None
+        self.search += 1
+        return start, goal
+
+    # A* with the Manhattan distance as its heuristic.
+    def a_star(self, start, goal):
+        ends = self.__get_ends(start, goal)
+        if ends == None:
+            return []
+        start, goal = ends
+        tiles = self.model.tiles
+        parents = self.parents
+        costs = self.costs
+        seen = self.seen
+        closed = self.closed
+        search = self.search
+        heuristic = self.__heuristic
+        seen[start] = search
+        costs[start] = 0
+        # Entries are (estimated total, minus the cost so far, index). Ties on
+        # the total go to the entry furthest along, which is usually closer to
+        # the goal.
+        open_list = [(heuristic(start, goal), 0, start)]
+        while len(open_list) != 0:
+            total, tie_break, current = heappop(open_list)
+            if closed[current] == search:
+                continue
+            if current == goal:
+                return self.__build_path(start, goal, parents)
+            closed[current] = search
+            cost = costs[current]
+            # Open tiles are never on the border, so their neighbours are
+            # always inside the grid.
+            for step in self.steps:
+                neighbour = current + step
+                if tiles[neighbour] & TYPE_MASK == WALL or closed[neighbour] == search:
+                    continue
+                if seen[neighbour] != search or cost+1 < costs[neighbour]:
+                    seen[neighbour] = search
+                    costs[neighbour] = cost+1
+                    parents[neighbour] = current
+                    heappush(open_list, (cost+1+heuristic(neighbour, goal), -(cost+1), neighbour))
+        return []
+
+    # Breadth first search from both ends at once, one whole layer at a time,
+    # always growing the side with the smaller frontier. It stops after the
+    # first layer where the two sides meet.
+    def bidirectional_bfs(self, start, goal):
+        ends = self.__get_ends(start, goal)
+        if ends == None:
+            return []
+        start, goal = ends
+        if start == goal:
+            return [divmod(start, self.width)]
+        tiles = self.model.tiles
+        search = self.search
+        # Both sides keep their distances in costs, as no tile is ever seen by
+        # both sides without the search stopping.
+        costs = self.costs
+        self.parents[start] = start
+        self.back_parents[goal] = goal
+        self.seen[start] = search
+        self.back_seen[goal] = search
+        costs[start] = 0
+        costs[goal] = 0
+        front = [start]
+        back = [goal]
+        while len(front) != 0 and len(back) != 0:
+            if len(front) <= len(back):
+                front, meeting = self.__grow_layer(front, self.seen, self.parents, self.back_seen, search, tiles)
+                if meeting != None:
+                    front_end, back_end = meeting
+            else:
+                back, meeting = self.__grow_layer(back, self.back_seen, self.back_parents, self.seen, search, tiles)
+                if meeting != None:
+                    back_end, front_end = meeting
+            if meeting != None:
+                path = self.__build_path(start, front_end, self.parents)
+                i = back_end
+                path.append(divmod(i, self.width))
+                while i != goal:
+                    i = self.back_parents[i]
+                    path.append(divmod(i, self.width))
+                return path
+        return []
+
+    # Grows one side of the bidirectional search by a layer. Returns the new
+    # frontier, and the pair of neighbouring tiles with the shortest total
+    # distance where this side touched the other side, if it did. The first
+    # tile of the pair is on the side that grew.
+    def __grow_layer(self, frontier, seen, parents, other_seen, search, tiles):
+        costs = self.costs
+        next_frontier = []
+        meeting = None
+        best = None
+        for current in frontier:
+            for step in self.steps:
+                neighbour = current + step
+                if tiles[neighbour] & TYPE_MASK == WALL:
+                    continue
+                if other_seen[neighbour] == search:
+                    total = costs[current] + 1 + costs[neighbour]
+                    if best == None or total < best:
+                        best = total
+                        meeting = (current, neighbour)
+                elif seen[neighbour] != search:
+                    seen[neighbour] = search
+                    parents[neighbour] = current
+                    costs[neighbour] = costs[current] + 1
+                    next_frontier.append(neighbour)
+        return next_frontier, meeting
+
+    # Jump point search for a grid where moves are only north, east, south
+    # and west. From each jump point the search runs straight in every open
+    # direction, except back the way it came, until it hits a wall or reaches
+    # the goal or a tile where a side turning opens up. Only those tiles go on
+    # the open list, so a long corridor costs one entry instead of one per
+    # tile. This is still A*, on a graph whose edges are straight runs of
+    # tiles, so the paths are still shortest paths.
+    def jump_point_search(self, start, goal):
+        ends = self.__get_ends(start, goal)
+        if ends == None:
+            return []
+        start, goal = ends
+        tiles = self.model.tiles
+        parents = self.parents
+        costs = self.costs
+        seen = self.seen
+        closed = self.closed
+        search = self.search
+        heuristic = self.__heuristic
+        steps = self.steps
+        seen[start] = search
+        costs[start] = 0
+        parents[start] = start
+        open_list = [(heuristic(start, goal), 0, start)]
+        while len(open_list) != 0:
+            total, tie_break, current = heappop(open_list)
+            if closed[current] == search:
+                continue
+            if current == goal:
+                return self.__build_jump_path(start, goal)
+            closed[current] = search
+            cost = costs[current]
+            back_step = self.__get_step(current, parents[current])
+            for direction in range(4):
+                step = steps[direction]
+                # Going back towards the parent can never be shorter.
+                if step == back_step:
+                    continue
+                jump_point, length = self.__jump(current, direction, goal, tiles)
+                if jump_point == None or closed[jump_point] == search:
+                    continue
+                if seen[jump_point] != search or cost+length < costs[jump_point]:
+                    seen[jump_point] = search
+                    costs[jump_point] = cost+length
+                    parents[jump_point] = current
+                    heappush(open_list, (cost+length+heuristic(jump_point, goal), -(cost+length), jump_point))
+        return []
+
+    # Returns the step that leads from one tile towards another on the same
+    # row or column, or 0 if they are the same tile.
+    def __get_step(self, a, b):
+        if a == b:
+            return 0
+        elif a//self.width == b//self.width:
+            return 1 if b > a else -1
+        else:
+            return self.width if b > a else -self.width
+
+    # Runs from a tile in one direction. Returns the tile it stopped on and how
+    # many steps away that was, or (None, 0) if it ran into a wall without
+    # finding anything.
+    def __jump(self, i, direction, goal, tiles):
+        step = self.steps[direction]
+        # The two directions at right angles to this one.
+        side1 = self.steps[(direction+1) % 4]
+        side2 = self.steps[(direction+3) % 4]
+        length = 0
+        while True:
+            i += step
+            if tiles[i] & TYPE_MASK == WALL:
+                return None, 0
+            length += 1
+            if i == goal:
+                return i, length
+            if tiles[i+side1] & TYPE_MASK != WALL or tiles[i+side2] & TYPE_MASK != WALL:
+                return i, length
+
+    # Jump points are joined by straight lines, so the tiles between each pair
+    # are filled back in.
+    def __build_jump_path(self, start, goal):
+        points = [goal]
+        i = goal
+        while i != start:
+            i = self.parents[i]
+            points.append(i)
+        points.reverse()
+        path = [divmod(start, self.width)]
+        for index in range(1, len(points)):
+            a = points[index-1]
+            b = points[index]
+            step = self.__get_step(a, b)
+            while a != b:
+                a += step
+                path.append(divmod(a, self.width))
+        return path
@@ -0,0 +1,61 @@
+from random import seed, choice
+from time import perf_counter
+from maze_model import MazeModel
+from pathfinder import PathFinder
+from junction_graph import JunctionGraph
+
+# The pathfinding package is only needed to compare against, as the game
+# doesn't use it anymore.
+try:
+    from pathfinding.finder.a_star import AStarFinder
+    from pathfinding.core.grid import Grid as PathGrid
+except ImportError:
+    AStarFinder = None
+
+# (name, cells per side, loop chance, number of queries)
+SIZES = (("EASY", 15, 0.1, 200),
+         ("MEDIUM", 27, 0.08, 100),
+         ("HARD", 45, 0.05, 50),
+         ("500x500", 500, 0.05, 5))
+
+# Times each search over the same random pairs of cells and returns the
+# average time per query in milliseconds.
+def time_queries(search, pairs):
+    start_time = perf_counter()
+    for start, goal in pairs:
+        search(start, goal)
+    return (perf_counter()-start_time)*1000/len(pairs)
+
+# Runs a search with the pathfinding package the way the enemy used to: the
+# matrix is built once, and the grid is cleaned up after every search.
+def library_search(pathgrid, finder, start, goal):
+    path, runs = finder.find_path(pathgrid.node(start[1], start[0]), pathgrid.node(goal[1], goal[0]), pathgrid)
+    pathgrid.cleanup()
+    return path
+
+def main():
+    print("maze      pathfinding A*   A*       bidir BFS  JPS      junctions  (ms per query)")
+    for name, cells, loop_chance, queries in SIZES:
+        seed(cells)
+        model = MazeModel(cells, cells)
+        model.recursive_backtracker(*model.get_random_cell(), loop_chance)
+        cell_rows = range(1, model.MAX_VER_TILES, 2)
+        cell_cols = range(1, model.MAX_HOR_TILES, 2)
+        pairs = [((choice(cell_rows), choice(cell_cols)), (choice(cell_rows), choice(cell_cols))) for query in range(queries)]
+        finder = PathFinder(model)
+        junctions = JunctionGraph(model)
+        if AStarFinder != None:
+            matrix = [[0 if model.is_wall(row, col) else 1 for col in range(model.MAX_HOR_TILES)] for row in range(model.MAX_VER_TILES)]
+            pathgrid = PathGrid(matrix=matrix)
+            library_finder = AStarFinder()
+            library_time = "%-16.3f" % time_queries(lambda start, goal: library_search(pathgrid, library_finder, start, goal), pairs)
+        else:
+            library_time = "%-16s" % "not installed"
+        print("%-9s %s %-8.3f %-10.3f %-8.3f %-10.3f" % (name, library_time,
+              time_queries(finder.a_star, pairs),
+              time_queries(finder.bidirectional_bfs, pairs),
+              time_queries(finder.jump_point_search, pairs),
+              time_queries(junctions.get_path, pairs)))
+
+if __name__ == "__main__":
+    main()
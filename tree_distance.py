@@ -0,0 +1,274 @@
+from array import array
+from operator import add
+from maze_model import TYPE_MASK, WALL
+
+# Stands in for the distance to a tile that can't be reached. It is big
+# enough that adding two of them together is still clearly unreachable.
+UNREACHED = 1 << 28
+
+# Tiles walked between steps of TreeDistance.build_steps(), which is a few
+# milliseconds' work.
+WALK_STEP_TILES = 1024
+
+## CLASSES
+# Answers how far apart two tiles are, and which way to step, without
+# searching. With a low loop chance the maze is a tree plus a few extra
+# passages, so the open tiles are split into a spanning tree and the few
+# edges left over.
+# The distance along the tree comes from the depths of the two tiles and of
+# their lowest common ancestor, which is found with an Euler tour of the tree
+# and a sparse table over the depths along it.
+# One end of every edge left over is a portal, and the distance from every
+# portal to every tile is worked out up front. A shortest path either stays on
+# the tree or goes through a portal, so the distance is the smallest of the
+# tree distance and, for each portal, the distance from one tile to the
+# portal plus the distance from the portal to the other tile.
+# Broken walls become portals as well when they are opened. Memory and set up
+# time grow with the number of portals, and so does every answer, which looks
+# at each portal in turn: it is only the search that is saved, not the time
+# per question. The distances take 4 bytes for every portal and tile, and
+# each portal's take a search of the whole maze. On the HARD preset, with
+# around a hundred portals, that is about 3 MB and 0.4 s to set up, and 20 to
+# 30 us an answer. So this is meant for mazes with few loops, asked about far
+# more often than they change.
+# Given build=False, nothing is worked out until build_steps() is run to the
+# end, so the set up can be spread over frames or stopped part way.
+class TreeDistance():
+    def __init__(self, model, build=True):
+        self.model = model
+        self.width = model.MAX_HOR_TILES
+        self.steps = model.steps
+        self.portal_count = 0
+        self.portals_done = 0
+        if build:
+            for step in self.build_steps():
+                pass
+
+    # Returns how far through build_steps() it is, from 0 to 1. Finishing
+    # off after the last portal counts as one more portal.
+    def get_build_progress(self):
+        return self.portals_done/(self.portal_count+1)
+
+    # Works everything out a few milliseconds at a time: yielding while the
+    # tree is walked, after each level of the sparse table, once the portals
+    # are found, and after each portal's distances, which are the slow part.
+    def build_steps(self):
+        self.portals_done = 0
+        tiles = self.model.tiles
+        size = len(tiles)
+        self.in_tree = bytearray(size)
+        self.parents = array('i', [-1])*size
+        self.depths = array('i', bytes(4*size))
+        self.components = array('i', [-1])*size
+        self.first_visit = array('i', bytes(4*size))
+        self.children = {}
+        # Entries are depth*size + tile, so the smallest entry in a stretch
+        # of the tour gives the depth of the lowest common ancestor.
+        tour = []
+        component = 0
+        for root in range(size):
+            if tiles[root] & TYPE_MASK != WALL and not self.in_tree[root]:
+                yield from self.__walk_tree(root, component, tour, size)
+                component += 1
+        yield from self.__build_sparse_table(tour)
+        portals = []
+        for i in range(size):
+            if self.in_tree[i]:
+                for step in (1, self.width):
+                    neighbour = i + step
+                    if self.in_tree[neighbour] and self.parents[i] != neighbour and self.parents[neighbour] != i:
+                        portals.append(i)
+        self.portals = portals
+        self.portal_count = len(portals)
+        yield
+        # Distance from portal p to tile i is at i*portal_count + p, so the
+        # distances from one tile to every portal sit next to each other.
+        self.portal_distances = array('i', [UNREACHED])*(size*self.portal_count)
+        for p in range(self.portal_count):
+            distances = array('i', [UNREACHED])*size
+            self.__fill_distances(portals[p], distances)
+            self.portal_distances[p::self.portal_count] = distances
+            self.portals_done = p+1
+            yield
+        self.portals_done = self.portal_count+1
+        # Broken walls, each with its own array of distances.
+        self.broken = []
+        self.broken_distances = []
+
+    # Depth first walk of one connected group of open tiles, which sets up
+    # the spanning tree and records the Euler tour. Yields after every
+    # WALK_STEP_TILES tiles.
+    def __walk_tree(self, root, component, tour, size):
+        tiles = self.model.tiles
+        steps = self.steps
+        in_tree = self.in_tree
+        parents = self.parents
+        depths = self.depths
+        in_tree[root] = 1
+        self.components[root] = component
+        self.first_visit[root] = len(tour)
+        tour.append(root)
+        stack = [(root, 0)]
+        walked = 0
+        while len(stack) != 0:
+            current, direction = stack.pop()
+            if direction == 4:
+                # Back up to the parent, which appears in the tour again.
+                parent = parents[current]
+                if parent != -1:
+                    tour.append(depths[parent]*size + parent)
+                continue
+            stack.append((current, direction+1))
+            neighbour = current + steps[direction]
+            if tiles[neighbour] & TYPE_MASK != WALL and not in_tree[neighbour]:
+                in_tree[neighbour] = 1
+                parents[neighbour] = current
+                depths[neighbour] = depths[current] + 1
+                self.components[neighbour] = component
+                self.first_visit[neighbour] = len(tour)
+                self.children.setdefault(current, []).append(neighbour)
+                tour.append(depths[neighbour]*size + neighbour)
+                stack.append((neighbour, 0))
+                walked += 1
+                if walked % WALK_STEP_TILES == 0:
+                    yield
+
+    # Level j of the table holds the smallest entry of every stretch of 2**j
+    # tour entries, starting at each position. Yields after each level.
+    def __build_sparse_table(self, tour):
+        table = [tour]
+        half = 1
+        while half*2 <= len(tour):
+            previous = table[-1]
+            table.append(list(map(min, previous[:len(previous)-half], previous[half:])))
+            half *= 2
+            yield
+        self.table = table
+
+    # Breadth first search from a tile, filling in the distance to every tile
+    # it can reach.
+    def __fill_distances(self, source, distances):
+        tiles = self.model.tiles
+        steps = self.steps
+        distances[source] = 0
+        frontier = [source]
+        distance = 0
+        while len(frontier) != 0:
+            distance += 1
+            next_frontier = []
+            for current in frontier:
+                for step in steps:
+                    neighbour = current + step
+                    if distances[neighbour] == UNREACHED and tiles[neighbour] & TYPE_MASK != WALL:
+                        distances[neighbour] = distance
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+
+    # Returns the depth of the lowest common ancestor of two tiles in the tree.
+    def __lca_depth(self, a, b):
+        left = self.first_visit[a]
+        right = self.first_visit[b]
+        if left > right:
+            left, right = right, left
+        level = (right-left+1).bit_length()-1
+        row = self.table[level]
+        return min(row[left], row[right-(1 << level)+1]) // len(self.model.tiles)
+
+    # Distance along the tree, or UNREACHED if either tile isn't on it or they
+    # aren't joined at all.
+    def __tree_distance(self, a, b):
+        if not self.in_tree[a] or not self.in_tree[b] or self.components[a] != self.components[b]:
+            return UNREACHED
+        return self.depths[a] + self.depths[b] - 2*self.__lca_depth(a, b)
+
+    # Returns the shortest distance between two indexes, and how it was found:
+    # None for the tree, or the portal's array, stride and offset.
+    def __distance(self, a, b):
+        best = self.__tree_distance(a, b)
+        route = None
+        count = self.portal_count
+        if count != 0:
+            distances = self.portal_distances
+            sums = list(map(add, distances[a*count:a*count+count], distances[b*count:b*count+count]))
+            shortest = min(sums)
+            if shortest < best:
+                best = shortest
+                route = (distances, count, sums.index(shortest))
+        for distances in self.broken_distances:
+            if distances[a] + distances[b] < best:
+                best = distances[a] + distances[b]
+                route = (distances, 1, 0)
+        return best, route
+
+    # Returns the number of steps between two tiles, or None if one can't be
+    # reached from the other.
+    def get_distance(self, start, goal):
+        a = self.model.index(*start)
+        b = self.model.index(*goal)
+        if not self.model.is_open(a) or not self.model.is_open(b):
+            return None
+        distance, route = self.__distance(a, b)
+        if distance >= UNREACHED:
+            return None
+        return distance
+
+    # Returns the tile to move onto to get one step closer to the goal, or
+    # None if the start is the goal or can't reach it.
+    def next_step(self, start, goal):
+        a = self.model.index(*start)
+        b = self.model.index(*goal)
+        if a == b or not self.model.is_open(a) or not self.model.is_open(b):
+            return None
+        distance, route = self.__distance(a, b)
+        if distance >= UNREACHED:
+            return None
+        if route == None:
+            step = self.__tree_step(a, b)
+        else:
+            # Head for the portal, as the shortest path goes through it.
+            distances, stride, offset = route
+            step = None
+            if distances[a*stride + offset] != 0:
+                for neighbour in self.__open_neighbours(a):
+                    if distances[neighbour*stride + offset] == distances[a*stride + offset] - 1:
+                        step = neighbour
+                        break
+            if step == None:
+                # Standing on the portal, so check each way out.
+                for neighbour in self.__open_neighbours(a):
+                    if self.__distance(neighbour, b)[0] == distance-1:
+                        step = neighbour
+                        break
+        return divmod(step, self.width)
+
+    def __open_neighbours(self, i):
+        return [i+step for step in self.steps if self.model.is_open(i+step)]
+
+    # The next tile along the tree path: up to the parent, unless the start is
+    # an ancestor of the goal, in which case down to the child whose part of
+    # the tour contains the goal.
+    def __tree_step(self, a, b):
+        if self.__lca_depth(a, b) != self.depths[a]:
+            return self.parents[a]
+        goal_visit = self.first_visit[b]
+        step = None
+        for child in self.children[a]:
+            if self.first_visit[child] <= goal_visit:
+                step = child
+        return step
+
+    # Used as a listener for Grid.tile_changed. An opened wall gets the
+    # distance to every tile worked out, which keeps every answer exact, as
+    # any shorter path made by it goes through it. Anything that closes a
+    # tile makes every stored distance suspect, so everything is built again.
+    def tile_changed(self, row, col):
+        i = row*self.width + col
+        known = self.in_tree[i] or i in self.broken
+        if self.model.is_open(i) and not known:
+            distances = array('i', [UNREACHED])*len(self.model.tiles)
+            self.__fill_distances(i, distances)
+            self.broken.append(i)
+            self.broken_distances.append(distances)
+        elif not self.model.is_open(i) and known:
+            for step in self.build_steps():
+                pass